@@ -0,0 +1,104 @@
+import os
+import time
+
+import numpy as np
+
+LOGGER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Which runtime classifies images: 'keras' runs the original .h5 model, 'tflite' a
+# model converted with convert_model.py
+INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'keras')
+KERAS_MODEL_PATH = os.environ.get('KERAS_MODEL_PATH', os.path.join(LOGGER_DIR, 'model_food_101.h5'))
+TFLITE_MODEL_PATH = os.environ.get('TFLITE_MODEL_PATH', os.path.join(LOGGER_DIR, 'model_food_101.tflite'))
+
+# Threads the TFLite interpreter may use per inference; 0 lets it decide
+TFLITE_NUM_THREADS = int(os.environ.get('TFLITE_NUM_THREADS', 0))
+
+BACKENDS = ('keras', 'tflite')
+
+
+class KerasBackend:
+    """The original Keras model, float32 throughout"""
+
+    name = 'keras'
+
+    def __init__(self, path=KERAS_MODEL_PATH):
+        # Imported here so TFLite workers never pay for loading TensorFlow
+        from keras.models import load_model
+
+        started = time.perf_counter()
+        self.path = path
+        self.model = load_model(path)
+        self.load_seconds = time.perf_counter() - started
+
+    def predict(self, inputs):
+        """(N, classes) probabilities for an (N, H, W, 3) float32 batch"""
+        return self.model.predict(inputs, verbose=0)
+
+
+def _interpreter_class():
+    # The standalone runtime is a few MB; full TensorFlow works as well
+    try:
+        from tflite_runtime.interpreter import Interpreter
+    except ImportError:
+        from tensorflow.lite import Interpreter
+    return Interpreter
+
+
+class TFLiteBackend:
+    """
+    A converted TFLite model, float32, float16 or int8 quantized.
+
+    Inputs are always the float32 batch the Keras model takes; quantized models have
+    them quantized with the input tensor's scale and zero point, and their outputs
+    dequantized, so callers can swap backends freely. The interpreter is not thread
+    safe, which the pipeline's single inference thread already guarantees.
+    """
+
+    name = 'tflite'
+
+    def __init__(self, path=TFLITE_MODEL_PATH, num_threads=TFLITE_NUM_THREADS):
+        started = time.perf_counter()
+        self.path = path
+        self.interpreter = _interpreter_class()(model_path=path, num_threads=num_threads or None)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        self.load_seconds = time.perf_counter() - started
+
+    def _resize(self, batch_size):
+        # Reallocating is cheap next to inference, and micro-batch sizes repeat
+        if batch_size != self._batch_size:
+            shape = [batch_size] + list(self._input['shape'][1:])
+            self.interpreter.resize_tensor_input(self._input['index'], shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch_size
+
+    def predict(self, inputs):
+        """(N, classes) probabilities for an (N, H, W, 3) float32 batch"""
+        self._resize(len(inputs))
+
+        dtype = self._input['dtype']
+        if dtype != np.float32:
+            scale, zero_point = self._input['quantization']
+            info = np.iinfo(dtype)
+            inputs = np.clip(np.round(inputs / scale + zero_point), info.min, info.max).astype(dtype)
+
+        self.interpreter.set_tensor(self._input['index'], inputs)
+        self.interpreter.invoke()
+        outputs = self.interpreter.get_tensor(self._output['index'])
+
+        if outputs.dtype != np.float32:
+            scale, zero_point = self._output['quantization']
+            outputs = (outputs.astype(np.float32) - zero_point) * scale
+        return outputs
+
+
+def load_backend(name=INFERENCE_BACKEND, path=None):
+    """Inference backend by name, loading its model from path or the configured default"""
+    if name == 'keras':
+        return KerasBackend(path or KERAS_MODEL_PATH)
+    if name == 'tflite':
+        return TFLiteBackend(path or TFLITE_MODEL_PATH)
+    raise ValueError(f"Unknown inference backend: {name!r}, expected one of {', '.join(BACKENDS)}")
@@ -0,0 +1,184 @@
+import asyncio
+import os
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from latency import summarize
+
+# Images per model call, and how long the first request of a batch waits for company
+INFERENCE_MAX_BATCH_SIZE = int(os.environ.get('INFERENCE_MAX_BATCH_SIZE', 16))
+INFERENCE_MAX_WAIT_MS = float(os.environ.get('INFERENCE_MAX_WAIT_MS', 5))
+
+# Recent samples kept for the latency percentiles
+METRICS_WINDOW = 1000
+
+
+class BatchMetrics:
+    """Thread-safe counters and recent timings of an InferenceBatcher"""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.errors = 0
+        self.batch_sizes = Counter()
+        self.queue_wait_ms = deque(maxlen=window)
+        self.inference_ms = deque(maxlen=window)
+
+    def record_batch(self, size, queue_waits_ms, inference_ms):
+        with self._lock:
+            self.batches += 1
+            self.requests += len(queue_waits_ms)
+            self.batch_sizes[size] += 1
+            self.queue_wait_ms.extend(queue_waits_ms)
+            self.inference_ms.append(inference_ms)
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self):
+        """Plain dict of the metrics, ready for JSON"""
+        with self._lock:
+            total_images = sum(size * count for size, count in self.batch_sizes.items())
+            return {
+                'batches': self.batches,
+                'requests': self.requests,
+                'errors': self.errors,
+                'mean_batch_size': round(total_images / self.batches, 2) if self.batches else None,
+                'batch_size_histogram': {str(size): count for size, count in sorted(self.batch_sizes.items())},
+                'queue_wait_ms': summarize(self.queue_wait_ms),
+                'inference_ms': summarize(self.inference_ms),
+            }
+
+
+class InferenceBatcher:
+    """
+    Gathers concurrent prediction requests into micro-batches.
+
+    Requests wait in a queue; a batch is closed once it holds max_batch_size images or
+    max_wait_ms has passed since its first request, then runs as one predict call on
+    the given executor and every caller gets its own rows of the output. Inputs are
+    scaled straight into a preallocated float32 batch tensor, so requests can hand
+    over raw uint8 pixels. Must be used from a single event loop.
+    """
+
+    def __init__(self, predict, executor, max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                 max_wait_ms=INFERENCE_MAX_WAIT_MS, input_scale=1.0):
+        """
+        Parameters:
+        -----------
+        predict : callable
+            Maps an (N, H, W, C) input batch to an (N, classes) output
+        executor : concurrent.futures.Executor
+            Where predict runs, so the event loop never blocks on the model
+        max_batch_size : int
+            Most images in one predict call
+        max_wait_ms : float
+            Longest a request waits for others to join its batch
+        input_scale : float
+            Factor applied to the inputs while copying them into the batch tensor
+        """
+        self.predict = predict
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.input_scale = np.float32(input_scale)
+        self._buffer = None
+        self.metrics = BatchMetrics()
+        self._queue = None
+        self._worker = None
+
+    async def submit(self, inputs):
+        """Model output for an (n, H, W, C) input, computed as part of a batch"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            # Started on first use, and again should it ever have stopped
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((inputs, future, time.perf_counter()))
+        return await future
+
+    async def close(self):
+        """Stop the batching task"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            await self._predict_batch(loop, batch)
+
+    def _assemble(self, items):
+        """
+        Scale the inputs into the reusable batch tensor.
+
+        Only one batch is in flight at a time, so the tensor can be overwritten as soon
+        as the previous predict call has returned.
+        """
+        total = sum(len(item) for item in items)
+        shape = items[0].shape[1:]
+        if self._buffer is None or self._buffer.shape[1:] != shape or len(self._buffer) < total:
+            self._buffer = np.empty((max(total, self.max_batch_size),) + shape, dtype=np.float32)
+
+        batch = self._buffer[:total]
+        offset = 0
+        for item in items:
+            np.multiply(item, self.input_scale, out=batch[offset:offset + len(item)], casting='unsafe')
+            offset += len(item)
+        return batch
+
+    async def _predict_batch(self, loop, batch):
+        # Callers that gave up (e.g. timed out) don't need a slot in the batch
+        batch = [item for item in batch if not item[1].done()]
+        if not batch:
+            return
+
+        started = time.perf_counter()
+        queue_waits_ms = [(started - enqueued) * 1000 for _, _, enqueued in batch]
+
+        # Any failure fails this batch's requests only, the worker goes on with the next
+        try:
+            inputs = self._assemble([inputs for inputs, _, _ in batch])
+            outputs = await loop.run_in_executor(self.executor, self.predict, inputs)
+            if len(outputs) != len(inputs):
+                raise ValueError(f"Model returned {len(outputs)} outputs for {len(inputs)} inputs")
+
+            self.metrics.record_batch(len(inputs), queue_waits_ms, (time.perf_counter() - started) * 1000)
+
+            offset = 0
+            for item_inputs, future, _ in batch:
+                count = len(item_inputs)
+                if not future.done():
+                    future.set_result(outputs[offset:offset + count])
+                offset += count
+        except Exception as e:
+            self.metrics.record_error()
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
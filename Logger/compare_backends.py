@@ -0,0 +1,108 @@
+import argparse
+import json
+import time
+
+import numpy as np
+
+from backends import KERAS_MODEL_PATH, TFLITE_MODEL_PATH, load_backend
+from convert_model import find_images, load_inputs
+from labels import labels
+from latency import summarize
+
+# Top-1 agreement with the Keras model a converted model must reach to pass
+MIN_AGREEMENT = 0.99
+
+# Timed single-image predictions per backend, after a warm-up call
+BENCHMARK_RUNS = 50
+
+
+def benchmark(backend, inputs, runs=BENCHMARK_RUNS, batch_size=16):
+    """Per-image latency at batch size 1 and throughput at batch_size, in ms and images/s"""
+    backend.predict(inputs[:1])
+
+    single = []
+    for i in range(runs):
+        started = time.perf_counter()
+        backend.predict(inputs[i % len(inputs)][np.newaxis])
+        single.append((time.perf_counter() - started) * 1000)
+
+    batch = np.resize(inputs, (batch_size,) + inputs.shape[1:])
+    backend.predict(batch)
+    started = time.perf_counter()
+    rounds = max(1, runs // batch_size)
+    for _ in range(rounds):
+        backend.predict(batch)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'load_seconds': round(backend.load_seconds, 3),
+        'single_image_ms': summarize(single),
+        f'batch_{batch_size}_images_per_second': round(rounds * batch_size / elapsed, 1),
+    }
+
+
+def compare(images, keras_path=KERAS_MODEL_PATH, tflite_path=TFLITE_MODEL_PATH, runs=BENCHMARK_RUNS):
+    """
+    Accuracy parity and latency of the TFLite model against the Keras original.
+
+    images are (path, label) pairs from find_images(); their labels are scored as
+    ground truth when they name a Food-101 class.
+    """
+    inputs = np.concatenate([load_inputs(path) for path, _ in images])
+    truth = [labels.index(label) if label in labels else None for _, label in images]
+
+    report = {'images': len(images)}
+    predictions = {}
+    for name, path in (('keras', keras_path), ('tflite', tflite_path)):
+        backend = load_backend(name, path)
+        probabilities = np.concatenate([backend.predict(inputs[i:i + 1]) for i in range(len(inputs))])
+        predictions[name] = probabilities
+
+        top1 = probabilities.argmax(axis=1)
+        scored = [(p, t) for p, t in zip(top1, truth) if t is not None]
+        report[name] = benchmark(backend, inputs, runs)
+        report[name]['accuracy'] = (
+            round(float(np.mean([p == t for p, t in scored])), 4) if scored else None
+        )
+        del backend
+
+    keras_top1 = predictions['keras'].argmax(axis=1)
+    tflite_top1 = predictions['tflite'].argmax(axis=1)
+    report['top1_agreement'] = round(float(np.mean(keras_top1 == tflite_top1)), 4)
+    report['max_probability_difference'] = round(
+        float(np.abs(predictions['keras'] - predictions['tflite']).max()), 4
+    )
+    report['disagreements'] = [
+        {'image': images[i][0], 'keras': labels[keras_top1[i]], 'tflite': labels[tflite_top1[i]]}
+        for i in np.flatnonzero(keras_top1 != tflite_top1)
+    ]
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Check a converted TFLite model against model_food_101.h5 and benchmark both"
+    )
+    parser.add_argument('--images', required=True, help="Folder of test images, optionally one folder per class")
+    parser.add_argument('--limit', type=int, help="Use at most this many images")
+    parser.add_argument('--keras-model', default=KERAS_MODEL_PATH)
+    parser.add_argument('--tflite-model', default=TFLITE_MODEL_PATH)
+    parser.add_argument('--runs', type=int, default=BENCHMARK_RUNS, help="Timed predictions per backend")
+    parser.add_argument('--min-agreement', type=float, default=MIN_AGREEMENT,
+                        help=f"Top-1 agreement required to pass (default: {MIN_AGREEMENT})")
+    parser.add_argument('--output', help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    images = find_images(args.images, args.limit)
+    if not images:
+        parser.error(f"No images found in {args.images}")
+
+    report = compare(images, args.keras_model, args.tflite_model, args.runs)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if report['top1_agreement'] < args.min_agreement:
+        raise SystemExit(f"FAIL: top-1 agreement {report['top1_agreement']} is below {args.min_agreement}")
+    print(f"OK: top-1 agreement {report['top1_agreement']}")
@@ -0,0 +1,96 @@
+import argparse
+import os
+
+import numpy as np
+
+from backends import KERAS_MODEL_PATH, TFLITE_MODEL_PATH
+from images import decode_image
+
+QUANTIZATIONS = ('none', 'float16', 'dynamic', 'int8')
+
+# Images fed to the converter to calibrate int8 activation ranges
+CALIBRATION_IMAGES = 200
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+
+def find_images(folder, limit=None):
+    """
+    Image paths under folder, sorted, with the name of their parent folder as label.
+
+    Laid out like Food-101 (one folder per class) the label is the true class and can
+    be scored; otherwise it is just the folder name.
+    """
+    found = []
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                found.append((os.path.join(root, name), os.path.basename(root)))
+    found.sort()
+    return found[:limit] if limit else found
+
+
+def load_inputs(path):
+    """Model input for one image file, scaled like the serving pipeline does"""
+    with open(path, 'rb') as f:
+        return decode_image(f.read()).astype(np.float32) / 255.0
+
+
+def convert(keras_path, output_path, quantization='none', calibration_dir=None,
+            calibration_images=CALIBRATION_IMAGES):
+    """
+    Convert the Keras model to TFLite.
+
+    'float16' halves the weights, 'dynamic' stores int8 weights and quantizes
+    activations on the fly, and 'int8' quantizes weights and activations with ranges
+    calibrated on real images, which calibration_dir must then provide. Returns the
+    size of the written model in bytes.
+    """
+    import tensorflow as tf
+
+    model = tf.keras.models.load_model(keras_path)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if quantization != 'none':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if not calibration_dir:
+            raise ValueError("int8 quantization needs calibration images, pass --calibration-dir")
+        paths = [path for path, _ in find_images(calibration_dir, calibration_images)]
+        if not paths:
+            raise ValueError(f"No images found in {calibration_dir}")
+
+        def representative_dataset():
+            for path in paths:
+                yield [load_inputs(path)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        # Inputs and outputs stay float32, so the backend is a drop-in replacement
+        converter.inference_input_type = tf.float32
+        converter.inference_output_type = tf.float32
+
+    tflite_model = converter.convert()
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
+    return len(tflite_model)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert model_food_101.h5 for the TFLite inference backend")
+    parser.add_argument('--keras-model', default=KERAS_MODEL_PATH, help="Keras model to convert")
+    parser.add_argument('--output', default=TFLITE_MODEL_PATH, help="Where to write the TFLite model")
+    parser.add_argument('--quantization', choices=QUANTIZATIONS, default='float16',
+                        help="Weight/activation quantization (default: float16)")
+    parser.add_argument('--calibration-dir', help="Images calibrating int8 quantization")
+    parser.add_argument('--calibration-images', type=int, default=CALIBRATION_IMAGES,
+                        help=f"Calibration images used at most (default: {CALIBRATION_IMAGES})")
+    args = parser.parse_args()
+
+    size = convert(args.keras_model, args.output, args.quantization, args.calibration_dir, args.calibration_images)
+    original = os.path.getsize(args.keras_model)
+    print(f"Wrote {args.output}: {size / 1e6:.1f} MB ({args.quantization}), "
+          f"{original / 1e6:.1f} MB for the Keras model")
+    print(f"Check it with: python compare_backends.py --images <folder> --tflite-model {args.output}")
@@ -0,0 +1,141 @@
+"""
+Local stand-in for the Gemini generateContent API.
+
+Answers every POST with a fixed, well-formed nutrition reply after an optional delay,
+so the food logging API can be run and tested without network access or an API key:
+
+    python gemini_stub.py --port 8089 --delay 0.5
+    GEMINI_API_URL=http://127.0.0.1:8089/ python food_api.py
+
+For load tests the latency can vary and a share of the calls can fail or come back
+incomplete, e.g. --delay 0.3 --jitter 0.4 --error-rate 0.05. GET /stats returns how
+many calls were answered each way.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Replies in the comma-separated formats the prompts ask for
+PIECEWISE_REPLY = "120, 285, 240, 570"
+SERVING_REPLY = "300, 420, 140"
+
+# Reply missing values, which the client answers with default nutrition
+INCOMPLETE_REPLY = "300"
+
+
+class StubStats:
+    """Thread-safe count of the answers given, by outcome"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def record(self, outcome):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+class GeminiStubHandler(BaseHTTPRequestHandler):
+    delay = 0.0
+    jitter = 0.0
+    status = 200
+    error_rate = 0.0
+    error_status = 503
+    incomplete_rate = 0.0
+    stats = None
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/stats':
+            self._send(200, self.stats.snapshot())
+        else:
+            self._send(404, {'error': {'code': 404, 'message': 'not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+
+        delay = self.delay + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            time.sleep(delay)
+
+        if self.status != 200:
+            self.stats.record(str(self.status))
+            self._send(self.status, {'error': {'code': self.status, 'message': 'stub error'}})
+            return
+
+        if self.error_rate and random.random() < self.error_rate:
+            self.stats.record(str(self.error_status))
+            self._send(self.error_status, {'error': {'code': self.error_status, 'message': 'injected error'}})
+            return
+
+        try:
+            prompt = payload['contents'][0]['parts'][0]['text']
+        except (KeyError, IndexError, TypeError):
+            self._send(400, {'error': {'code': 400, 'message': 'missing prompt'}})
+            return
+
+        if self.incomplete_rate and random.random() < self.incomplete_rate:
+            self.stats.record('incomplete')
+            reply = INCOMPLETE_REPLY
+        else:
+            self.stats.record('200')
+            reply = PIECEWISE_REPLY if 'per piece' in prompt else SERVING_REPLY
+        self._send(200, {'candidates': [{'content': {'parts': [{'text': reply}], 'role': 'model'}}]})
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host='127.0.0.1', port=8089, delay=0.0, status=200, jitter=0.0, error_rate=0.0,
+                error_status=503, incomplete_rate=0.0):
+    """
+    A stub server ready to serve_forever(); port 0 picks a free port.
+
+    Every reply waits delay plus up to jitter seconds. status other than 200 fails
+    every call; otherwise error_rate of the calls fail with error_status and
+    incomplete_rate of them get a reply missing values. Counts are on server.stats.
+    """
+    stats = StubStats()
+    handler = type('ConfiguredGeminiStubHandler', (GeminiStubHandler,), {
+        'delay': delay, 'jitter': jitter, 'status': status, 'error_rate': error_rate,
+        'error_status': error_status, 'incomplete_rate': incomplete_rate, 'stats': stats
+    })
+    server_class = type('StubServer', (ThreadingHTTPServer,), {'request_queue_size': 256})
+    server = server_class((host, port), handler)
+    server.daemon_threads = True
+    server.stats = stats
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve canned Gemini nutrition replies")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--delay', type=float, default=0.0, help="Seconds to wait before every reply")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Up to this many extra seconds, drawn per reply")
+    parser.add_argument('--status', type=int, default=200, help="HTTP status to answer every call with")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of calls that fail")
+    parser.add_argument('--error-status', type=int, default=503, help="HTTP status of failed calls")
+    parser.add_argument('--incomplete-rate', type=float, default=0.0, help="Share of replies missing values")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.delay, args.status, args.jitter, args.error_rate,
+                         args.error_status, args.incomplete_rate)
+    print(f"Gemini stub listening on http://{args.host}:{server.server_port}/")
+    server.serve_forever()
@@ -0,0 +1,51 @@
+import io
+import os
+import random
+import uuid
+
+import numpy as np
+from PIL import Image
+from werkzeug.utils import secure_filename
+
+# Input size of the Food-101 model
+IMAGE_SIZE = (224, 224)
+
+# Keep a sample of uploads on disk, e.g. for auditing predictions; off by default
+KEEP_UPLOADS_RATE = float(os.environ.get('KEEP_UPLOADS_RATE', 0))
+
+
+def decode_image(data, size=IMAGE_SIZE):
+    """
+    Decode uploaded image bytes into a (1, H, W, 3) uint8 array, entirely in memory.
+
+    Matches keras' load_img(target_size=...): RGB conversion and a nearest-neighbour
+    resize, so predictions are unchanged.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if img.size != size:
+            img = img.resize(size, Image.NEAREST)
+        return np.asarray(img, dtype=np.uint8)[np.newaxis]
+
+
+class UploadArchive:
+    """Writes a random sample of uploads to a folder under unique names"""
+
+    def __init__(self, folder, rate=KEEP_UPLOADS_RATE):
+        self.folder = folder
+        self.rate = rate
+        if rate > 0:
+            os.makedirs(folder, exist_ok=True)
+
+    def maybe_keep(self, data, filename):
+        """Save the upload with probability rate, returns the path it was saved to or None"""
+        if self.rate <= 0 or random.random() >= self.rate:
+            return None
+
+        # The client's name only contributes its extension, so uploads never collide
+        extension = os.path.splitext(secure_filename(filename or ''))[1].lower()
+        path = os.path.join(self.folder, f"{uuid.uuid4().hex}{extension}")
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
@@ -0,0 +1,16 @@
+import numpy as np
+
+
+def summarize(samples_ms, decimals=3):
+    """Mean, percentiles and maximum of latency samples in ms, or None without samples"""
+    values = np.fromiter(samples_ms, dtype=float)
+    if not len(values):
+        return None
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {
+        'mean': round(float(values.mean()), decimals),
+        'p50': round(float(p50), decimals),
+        'p90': round(float(p90), decimals),
+        'p99': round(float(p99), decimals),
+        'max': round(float(values.max()), decimals),
+    }
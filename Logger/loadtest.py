@@ -0,0 +1,282 @@
+"""
+Load generator for the Calorix services.
+
+Drives POST /profile and GET /seasonal on the diet planner (Models/app.py) and
+POST /predict on the food logging API (food_api.py) with a fixed number of concurrent
+clients, stepping through concurrency levels so the saturation point shows up as the
+level where throughput stops growing while latency does. Run the food logging API
+against gemini_stub.py so no real Gemini calls are made:
+
+    python gemini_stub.py --delay 0.3 --jitter 0.4 --error-rate 0.05
+    GEMINI_API_URL=http://127.0.0.1:8089/ python food_api.py
+    python loadtest.py --scenario profile seasonal predict --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import json
+import os
+import itertools
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+
+import aiohttp
+
+from latency import summarize
+
+LOGGER_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(LOGGER_DIR, '..', 'Models')
+MODELS_URL = os.environ.get('MODELS_URL', 'http://127.0.0.1:5000')
+LOGGER_URL = os.environ.get('LOGGER_URL', 'http://127.0.0.1:5001')
+
+PROFILE_TEMPLATE_PATH = os.path.join(MODELS_DIR, 'user_profile.json')
+IMAGES_DIR = os.path.join(LOGGER_DIR, 'uploads')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+SCENARIOS = ('profile', 'seasonal', 'predict')
+DEFAULT_CONCURRENCY = [1, 4, 16, 64]
+
+# Seconds each concurrency level runs, and seconds per request before it counts as failed
+DEFAULT_DURATION = 20
+REQUEST_TIMEOUT = 60
+
+# Values the generated profiles and seasonal queries draw from
+SEXES = ['male', 'female']
+# The keys of ACTIVITY_FACTORS in Models/diet_recommendation_app.py; the planner treats
+# any other value as sedentary
+ACTIVITY_LEVELS = ['sedentary', 'light', 'moderate', 'active', 'very_active']
+GOALS = ['lose_weight', 'maintain', 'gain_weight']
+DIET_TYPES = ['Vegan', 'Vegetarian', 'Non-Vegetarian']
+ALLERGIES = ['nuts', 'milk', 'soya', 'soy', 'gluten', 'eggs', 'shellfish']
+CUISINES = ['American', 'Chinese', 'French', 'Greek', 'Indian', 'Italian', 'Japanese', 'Korean',
+            'Lebanese', 'Mexican', 'Spanish', 'Thai', 'Vietnamese']
+MEALS = ['breakfast', 'lunch', 'dinner', 'snack']
+SEASONAL_MEAL_TYPES = [None, 'breakfast', 'lunch', 'dinner', 'snack']
+
+
+def generate_profiles(template, count, rng):
+    """Profile payloads shaped like the template, with varied body stats and preferences"""
+    profiles = []
+    for _ in range(count):
+        profile = dict(template)
+        profile.update({
+            'age': rng.randint(18, 75),
+            'sex': rng.choice(SEXES),
+            'weight_kg': round(rng.uniform(45, 120), 1),
+            'height_cm': round(rng.uniform(150, 200), 1),
+            'activity_level': rng.choice(ACTIVITY_LEVELS),
+            'goal': rng.choice(GOALS),
+            'diet_type': rng.choice(DIET_TYPES),
+            'allergies': rng.sample(ALLERGIES, rng.choice([0, 0, 1, 2, 4])),
+            'cuisines': {meal: rng.sample(CUISINES, rng.randint(1, 3)) for meal in MEALS if rng.random() < 0.7},
+        })
+        profiles.append(profile)
+    return profiles
+
+
+def generate_seasonal_queries(count, rng):
+    """Query strings for /seasonal, mixing diet, meal type and cuisine filters"""
+    queries = []
+    for _ in range(count):
+        query = {}
+        if rng.random() < 0.7:
+            query['diet_type'] = rng.choice(DIET_TYPES)
+        meal_type = rng.choice(SEASONAL_MEAL_TYPES)
+        if meal_type:
+            query['meal_type'] = meal_type
+        if rng.random() < 0.5:
+            query['cuisines'] = ','.join(rng.sample(CUISINES, rng.randint(1, 3)))
+        queries.append(query)
+    return queries
+
+
+def load_images(folder):
+    """(filename, bytes) of every image in folder"""
+    images = []
+    for name in sorted(os.listdir(folder)):
+        if name.lower().endswith(IMAGE_EXTENSIONS):
+            with open(os.path.join(folder, name), 'rb') as f:
+                images.append((name, f.read()))
+    return images
+
+
+class Scenario:
+    """
+    One endpoint and the payloads sent to it, cycled through by the clients.
+
+    Profiles are made unique unless replay is set: every pass over them nudges the
+    weights, so each request reaches the planner instead of its plan cache.
+    """
+
+    def __init__(self, name, method, url, payloads, replay=False):
+        self.name = name
+        self.method = method
+        self.url = url
+        self.payloads = payloads
+        self.replay = replay
+        # Requests sent over every level, so later levels don't repeat earlier payloads
+        self._sent = itertools.count()
+
+    def request(self, session):
+        i = next(self._sent)
+        payload = self.payloads[i % len(self.payloads)]
+        if self.name == 'profile':
+            passes = i // len(self.payloads)
+            if passes and not self.replay:
+                payload = dict(payload, weight_kg=round(payload['weight_kg'] + passes * 0.001, 3))
+            return session.post(self.url, json=payload)
+        if self.name == 'seasonal':
+            return session.get(self.url, params=payload)
+
+        filename, data = payload
+        form = aiohttp.FormData()
+        form.add_field('image', data, filename=filename)
+        return session.post(self.url, data=form)
+
+
+def build_scenario(name, models_url, logger_url, images_dir, count, rng, replay=False):
+    if name == 'profile':
+        with open(PROFILE_TEMPLATE_PATH) as f:
+            template = json.load(f)
+        return Scenario(name, 'POST', f"{models_url}/profile", generate_profiles(template, count, rng), replay)
+    if name == 'seasonal':
+        return Scenario(name, 'GET', f"{models_url}/seasonal", generate_seasonal_queries(count, rng))
+    if name == 'predict':
+        images = load_images(images_dir)
+        if not images:
+            raise ValueError(f"No images found in {images_dir}")
+        return Scenario(name, 'POST', f"{logger_url}/predict", images)
+    raise ValueError(f"Unknown scenario: {name!r}, expected one of {', '.join(SCENARIOS)}")
+
+
+async def run_level(scenario, concurrency, duration, timeout=REQUEST_TIMEOUT):
+    """
+    Keep concurrency requests in flight for duration seconds.
+
+    Every client sends its next request as soon as the previous one is answered, so
+    the offered load adapts to the service and throughput is what it can sustain.
+    """
+    latencies = []
+    outcomes = Counter()
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        deadline = time.perf_counter() + duration
+
+        async def client():
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    async with scenario.request(session) as resp:
+                        await resp.read()
+                        outcome = str(resp.status)
+                except asyncio.TimeoutError:
+                    outcome = 'timeout'
+                except aiohttp.ClientError as e:
+                    outcome = type(e).__name__
+                latencies.append((time.perf_counter() - started) * 1000)
+                outcomes[outcome] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    total = sum(outcomes.values())
+    succeeded = sum(count for outcome, count in outcomes.items() if outcome.startswith('2'))
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        'seconds': round(elapsed, 2),
+        'throughput_rps': round(succeeded / elapsed, 2),
+        'error_rate': round(1 - succeeded / total, 4) if total else None,
+        'latency_ms': summarize(latencies, decimals=2),
+        'outcomes': dict(outcomes),
+    }
+
+
+def saturation_level(levels, tolerance=0.1):
+    """
+    First concurrency level whose throughput is within tolerance of the best one; more
+    clients past it only add latency.
+    """
+    best = max(level['throughput_rps'] for level in levels)
+    if best == 0:
+        return None
+    for level in levels:
+        if level['throughput_rps'] >= best * (1 - tolerance):
+            return level['concurrency']
+
+
+async def run(scenarios, concurrency_levels, duration, timeout=REQUEST_TIMEOUT):
+    report = {}
+    for scenario in scenarios:
+        levels = []
+        for concurrency in concurrency_levels:
+            print(f"{scenario.name}: {concurrency} concurrent clients for {duration}s...", file=sys.stderr)
+            level = await run_level(scenario, concurrency, duration, timeout)
+            latency = level['latency_ms'] or {}
+            print(f"  {level['throughput_rps']} req/s, p50 {latency.get('p50')} ms, p99 {latency.get('p99')} ms, "
+                  f"errors {level['error_rate']}", file=sys.stderr)
+            levels.append(level)
+        report[scenario.name] = {
+            'url': scenario.url,
+            'levels': levels,
+            'saturation_concurrency': saturation_level(levels),
+        }
+    return report
+
+
+async def gemini_stats(url):
+    """Call counts of a gemini_stub.py instance, or None if it can't be reached"""
+    try:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5)) as session:
+            async with session.get(f"{url.rstrip('/')}/stats") as resp:
+                return await resp.json()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load test the diet planner and food logging APIs")
+    parser.add_argument('--scenario', nargs='+', choices=SCENARIOS, default=list(SCENARIOS),
+                        help="Endpoints to drive, one after another")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=DEFAULT_CONCURRENCY,
+                        help="Concurrent clients per level")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION, help="Seconds per level")
+    parser.add_argument('--timeout', type=float, default=REQUEST_TIMEOUT, help="Seconds before a request fails")
+    parser.add_argument('--models-url', default=MODELS_URL, help="Diet planner base URL")
+    parser.add_argument('--logger-url', default=LOGGER_URL, help="Food logging API base URL")
+    parser.add_argument('--images', default=IMAGES_DIR, help="Images uploaded to /predict")
+    parser.add_argument('--payloads', type=int, default=500, help="Distinct profiles and queries generated")
+    parser.add_argument('--replay-profiles', action='store_true',
+                        help="Resend the same profiles, measuring the plan cache rather than the planner")
+    parser.add_argument('--gemini-stub', metavar='URL', help="gemini_stub.py URL to collect call counts from")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="JSON report, defaults to loadtest_<timestamp>.json")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    scenarios = [
+        build_scenario(name, args.models_url, args.logger_url, args.images, args.payloads, rng, args.replay_profiles)
+        for name in args.scenario
+    ]
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'duration_per_level': args.duration,
+        'replay_profiles': args.replay_profiles,
+        'scenarios': asyncio.run(run(scenarios, args.concurrency, args.duration, args.timeout)),
+    }
+    if args.gemini_stub:
+        report['gemini_stub'] = asyncio.run(gemini_stats(args.gemini_stub))
+
+    output = args.output or f"loadtest_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for name, result in report['scenarios'].items():
+        print(f"{name}: saturates at {result['saturation_concurrency']} concurrent clients")
+    print(f"Saved load test report to {output}")
@@ -0,0 +1,247 @@
+import asyncio
+import os
+
+import aiohttp
+
+# Gemini API configuration: GEMINI_API_KEY is required unless GEMINI_API_URL points
+# somewhere else, e.g. a local stub (gemini_stub.py)
+GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+GEMINI_API_URL = os.environ.get('GEMINI_API_URL') or (
+    f"https://generativelanguage.googleapis.com/v1beta/models/"
+    f"gemini-2.0-flash:generateContent?key={GEMINI_API_KEY}"
+    if GEMINI_API_KEY else None
+)
+
+# Seconds allowed for a whole Gemini call and for opening the connection
+GEMINI_TIMEOUT = float(os.environ.get('GEMINI_TIMEOUT', 10))
+GEMINI_CONNECT_TIMEOUT = float(os.environ.get('GEMINI_CONNECT_TIMEOUT', 3))
+
+# Gemini calls in flight at once, and pooled connections kept open
+GEMINI_MAX_CONCURRENCY = int(os.environ.get('GEMINI_MAX_CONCURRENCY', 16))
+GEMINI_POOL_SIZE = int(os.environ.get('GEMINI_POOL_SIZE', 32))
+
+
+def build_prompt(food, is_piecewise):
+    """Gemini prompt asking for the nutrition values of a food label"""
+    prompt_food = food.replace('_', ' ')
+    if is_piecewise:
+        return (
+            f"For {prompt_food}, provide the following values, separated by commas:"
+            " Weight per piece (g), Calories per piece (kcal), Total weight of one serving (g), Total calories of one serving (kcal). No extra text."
+        )
+    return (
+        f"For {prompt_food}, provide the following values, separated by commas:"
+        " Total weight (g), Total calories (kcal), Calories per 100 grams (kcal). No extra text."
+    )
+
+
+# Extract piecewise info: calories per piece, weight per piece, total weight, total calories
+def extract_piecewise_info(text):
+    try:
+        # Split the comma-separated values returned by Gemini
+        values = text.split(',')
+        if len(values) >= 4:
+            # Convert values to appropriate types
+            try:
+                wp = float(values[0].strip())  # Weight per piece
+                cp = int(values[1].strip())    # Calories per piece
+                tw = float(values[2].strip())  # Total weight of one serving
+                tc = int(values[3].strip())    # Total calories of one serving
+                return cp, wp, tw, tc
+            except ValueError as e:
+                print(f"Value error in piecewise info: {e}")
+                return None, None, None, None
+        return None, None, None, None
+    except Exception as e:
+        print(f"Error parsing piecewise info: {e}")
+        return None, None, None, None
+
+def extract_serving_info(text):
+    try:
+        # Split the comma-separated values returned by Gemini
+        values = text.split(',')
+        if len(values) >= 3:
+            try:
+                tw = float(values[0].strip())     # Total weight of one serving (g)
+                tc = int(values[1].strip())       # Total calories of one serving (kcal)
+                cp_100g = int(values[2].strip())  # Calories per 100g
+                print(f"Extracted values: Total Weight = {tw}g, Total Calories = {tc}kcal, Calories per 100g = {cp_100g}kcal")
+                return tw, tc, cp_100g
+            except ValueError as e:
+                print(f"Value error in serving info: {e}")
+                return None, None, None
+        else:
+            print(f"Unexpected serving info format: {text}")
+            return None, None, None
+    except Exception as e:
+        print(f"Error parsing serving info: {e}")
+        return None, None, None
+
+def get_nutrition_info(food_name):
+    """Fallback nutrition data if Gemini API fails"""
+    nutrition_fallbacks = {
+        "fried_rice": {
+            "is_piecewise": False,
+            "total_weight": 300,
+            "total_calories": 420,
+            "calories_per_100g": 140
+        },
+        # Add more fallbacks for common foods here
+    }
+
+    # Return fallback data or default values
+    return nutrition_fallbacks.get(food_name, {
+        "is_piecewise": False,
+        "total_weight": 200,
+        "total_calories": 300,
+        "calories_per_100g": 150
+    })
+
+
+def parse_nutrition_reply(is_piecewise, reply):
+    """Nutrition fields from a Gemini reply, or None if it lacks any of the values"""
+    if is_piecewise:
+        cp, wp, tw, tc = extract_piecewise_info(reply)
+        if cp and wp and tw and tc:
+            return {
+                'calories_per_piece': cp,
+                'weight_per_piece': wp,
+                'total_weight': tw,
+                'total_calories': tc
+            }
+        return None
+
+    tw, tc, cp_100g = extract_serving_info(reply)
+    if tw and tc and cp_100g:
+        return {
+            'total_weight': tw,
+            'total_calories': tc,
+            'calories_per_100g': cp_100g
+        }
+    return None
+
+
+def default_nutrition(food, is_piecewise):
+    """Nutrition fields used when a Gemini reply could not be parsed"""
+    fallback = get_nutrition_info(food)
+    if is_piecewise:
+        return {
+            'calories_per_piece': fallback.get('calories_per_piece', 250),
+            'weight_per_piece': fallback.get('weight_per_piece', 100),
+            'total_weight': fallback.get('total_weight', 300),
+            'total_calories': fallback.get('total_calories', 750)
+        }
+    return {
+        'total_weight': fallback.get('total_weight', 200),
+        'total_calories': fallback.get('total_calories', 300),
+        'calories_per_100g': fallback.get('calories_per_100g', 150)
+    }
+
+
+class NutritionClient:
+    """
+    Async Gemini client for nutrition lookups.
+
+    Requests share one pooled aiohttp session, every call has a total and a connect
+    timeout, and a semaphore bounds how many calls are in flight so a slow upstream
+    can't pile up unbounded work. Any failure falls back to get_nutrition_info().
+    Parsed replies are kept in an optional NutritionCache, read and written off the
+    event loop, so a label is only looked up again once its entry expires, and
+    concurrent lookups of a label that isn't cached share a single Gemini call. The client must be used from a single event loop.
+    """
+
+    def __init__(self, api_url=None, timeout=None, connect_timeout=None, max_concurrency=None, pool_size=None,
+                 cache=None):
+        self.api_url = api_url or GEMINI_API_URL
+        if not self.api_url:
+            raise RuntimeError(
+                "GEMINI_API_KEY is not set; set it, or set GEMINI_API_URL to a stub such as gemini_stub.py"
+            )
+        self.cache = cache
+        self.timeout = aiohttp.ClientTimeout(
+            total=timeout or GEMINI_TIMEOUT,
+            connect=connect_timeout or GEMINI_CONNECT_TIMEOUT
+        )
+        self.max_concurrency = max_concurrency or GEMINI_MAX_CONCURRENCY
+        self.pool_size = pool_size or GEMINI_POOL_SIZE
+        self._session = None
+        self._semaphore = None
+        # Gemini calls in flight, by (label, is_piecewise)
+        self._in_flight = {}
+
+    def _ensure_session(self):
+        # Created on first use so they bind to the loop the client runs on
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    async def lookup(self, food, is_piecewise, refresh=False):
+        """Nutrition fields for a food label, from the cache, Gemini or the fallback table"""
+        if self.cache is not None and not refresh:
+            cached = await self.cache.get_async(food, is_piecewise)
+            if cached is not None:
+                return cached
+
+        # Join a call already made for the label; it runs as a task of its own, so a
+        # caller giving up doesn't cancel it for the others
+        key = (food, is_piecewise)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch_and_cache(key))
+            self._in_flight[key] = task
+        return dict(await asyncio.shield(task))
+
+    async def _fetch_and_cache(self, key):
+        try:
+            fields, parsed = await self._fetch(*key)
+
+            # Fallback values are not cached, so the label is retried on the next request
+            if parsed and self.cache is not None:
+                await self.cache.put_async(*key, fields)
+            return fields
+        finally:
+            self._in_flight.pop(key, None)
+
+    async def _fetch(self, food, is_piecewise):
+        """Nutrition fields and whether they were parsed from a complete Gemini reply"""
+        session = self._ensure_session()
+        prompt = build_prompt(food, is_piecewise)
+        payload = {"contents": [{"parts": [{"text": prompt}]}]}
+
+        print("Sending prompt to Gemini:", prompt)
+
+        try:
+            async with self._semaphore:
+                async with session.post(self.api_url, json=payload) as resp:
+                    if resp.status != 200:
+                        print(f"Gemini API error: {resp.status} - {await resp.text()}")
+                        # Use fallback data
+                        return dict(get_nutrition_info(food)), False
+                    body = await resp.json(content_type=None)
+        except asyncio.TimeoutError:
+            print(f"Gemini API timed out after {self.timeout.total}s")
+            return dict(get_nutrition_info(food)), False
+        except Exception as api_error:
+            print(f"Error calling Gemini API: {api_error}")
+            # Use fallback data
+            return dict(get_nutrition_info(food)), False
+
+        try:
+            reply = body['candidates'][0]['content']['parts'][0]['text']
+            print("Gemini API output:", reply)
+        except Exception as parse_error:
+            print(f"Error parsing Gemini response: {parse_error}")
+            # Use fallback data
+            return dict(get_nutrition_info(food)), False
+
+        fields = parse_nutrition_reply(is_piecewise, reply)
+        if fields is None:
+            # A reply missing some values gets the defaults for the whole record
+            return default_nutrition(food, is_piecewise), False
+        return fields, True
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+NUTRITION_CACHE_PATH = os.environ.get(
+    'NUTRITION_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nutrition_cache.sqlite3')
+)
+
+# Seconds a cached Gemini answer stays valid, 30 days by default
+NUTRITION_CACHE_TTL = float(os.environ.get('NUTRITION_CACHE_TTL', 30 * 24 * 3600))
+
+# Entries kept in memory; both prompt types of every label fit with room to spare
+NUTRITION_CACHE_LRU_SIZE = int(os.environ.get('NUTRITION_CACHE_LRU_SIZE', 256))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nutrition (
+    label TEXT NOT NULL,
+    prompt_type TEXT NOT NULL,
+    fields TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (label, prompt_type)
+)
+"""
+
+
+def prompt_type(is_piecewise):
+    return 'piece' if is_piecewise else 'serving'
+
+
+class NutritionCache:
+    """
+    Persistent cache of parsed Gemini nutrition answers, keyed by label and prompt type.
+
+    Entries live in a SQLite file so they survive restarts and are shared by every
+    process on the host, with an in-process LRU in front so repeated labels never touch
+    the disk. Entries older than the TTL are treated as missing. Coroutines use
+    get_async() and put_async(), which run the SQLite work on the cache's own thread
+    so disk I/O never blocks the event loop.
+    """
+
+    def __init__(self, path=NUTRITION_CACHE_PATH, ttl=NUTRITION_CACHE_TTL, lru_size=NUTRITION_CACHE_LRU_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.lru_size = lru_size
+
+        self._lock = threading.Lock()
+        self._lru = OrderedDict()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+
+        # One thread is enough, SQLite calls are serialized by the lock anyway
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='nutrition-cache')
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, label, is_piecewise):
+        """Cached nutrition fields, or None if missing or expired"""
+        key = (label, prompt_type(is_piecewise))
+        now = time.time()
+
+        with self._lock:
+            fields = self._memory_get(key, now)
+            if fields is not None:
+                return fields
+
+            row = self._db.execute(
+                'SELECT fields, created_at FROM nutrition WHERE label = ? AND prompt_type = ?', key
+            ).fetchone()
+            if row is None or now - row[1] >= self.ttl:
+                self._lru.pop(key, None)
+                self.misses += 1
+                return None
+
+            fields = json.loads(row[0])
+            self._remember(key, fields, row[1])
+            self.disk_hits += 1
+            return dict(fields)
+
+    async def get_async(self, label, is_piecewise):
+        """get() for coroutines; memory hits are answered inline, disk reads run on the cache's thread"""
+        with self._lock:
+            fields = self._memory_get((label, prompt_type(is_piecewise)), time.time())
+        if fields is not None:
+            return fields
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self.get, label, is_piecewise)
+
+    async def put_async(self, label, is_piecewise, fields):
+        """put() for coroutines, run on the cache's thread"""
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.put, label, is_piecewise, fields)
+
+    def _memory_get(self, key, now):
+        entry = self._lru.get(key)
+        if entry is None or now - entry[1] >= self.ttl:
+            return None
+        self._lru.move_to_end(key)
+        self.memory_hits += 1
+        return dict(entry[0])
+
+    def put(self, label, is_piecewise, fields):
+        """Store parsed nutrition fields for a label"""
+        key = (label, prompt_type(is_piecewise))
+        created_at = time.time()
+
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO nutrition (label, prompt_type, fields, created_at) VALUES (?, ?, ?, ?)',
+                key + (json.dumps(fields), created_at)
+            )
+            self._db.commit()
+            self._remember(key, dict(fields), created_at)
+
+    def _remember(self, key, fields, created_at):
+        self._lru[key] = (fields, created_at)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute('DELETE FROM nutrition')
+            self._db.commit()
+            self._lru.clear()
+
+    def stats(self):
+        """Counters for health checks"""
+        with self._lock:
+            entries = self._db.execute('SELECT COUNT(*) FROM nutrition').fetchone()[0]
+            return {
+                'entries': entries,
+                'in_memory': len(self._lru),
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+            }
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._db.close()
+
+
+async def warm(client, labels, calorie_base_label, refresh=False):
+    """
+    Look up every label through a cached NutritionClient.
+
+    Labels already cached are skipped unless refresh is set. Returns the labels that
+    could not be parsed from a Gemini answer and so are still uncached.
+    """
+    async def warm_label(label):
+        is_piecewise = calorie_base_label.get(label, 'serving') == 'piece'
+        await client.lookup(label, is_piecewise, refresh=refresh)
+        return label if await client.cache.get_async(label, is_piecewise) is None else None
+
+    try:
+        failed = await asyncio.gather(*(warm_label(label) for label in labels))
+    finally:
+        await client.close()
+    return [label for label in failed if label is not None]
+
+
+if __name__ == '__main__':
+    from labels import calorie_base_label, labels
+    from nutrition import NutritionClient
+
+    parser = argparse.ArgumentParser(description="Pre-populate the nutrition cache for every food label")
+    parser.add_argument('--path', default=NUTRITION_CACHE_PATH, help="SQLite cache file")
+    parser.add_argument('--refresh', action='store_true', help="Ask Gemini again for labels already cached")
+    args = parser.parse_args()
+
+    cache = NutritionCache(args.path)
+    start = time.perf_counter()
+    failed = asyncio.run(warm(NutritionClient(cache=cache), labels, calorie_base_label, args.refresh))
+
+    print(f"Warmed {len(labels) - len(failed)} of {len(labels)} labels in {time.perf_counter() - start:.1f}s")
+    if failed:
+        print(f"Not cached (Gemini failed or replied incompletely): {', '.join(failed)}")
+    print(cache.stats())
@@ -0,0 +1,149 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from batching import INFERENCE_MAX_BATCH_SIZE, INFERENCE_MAX_WAIT_MS, InferenceBatcher
+
+# Threads decoding images in parallel
+DECODE_WORKERS = int(os.environ.get('DECODE_WORKERS', 4))
+
+# Candidate labels returned per image, and the most a request can ask for. Only the
+# best candidate's nutrition is looked up, so more candidates cost no upstream calls
+TOP_K = int(os.environ.get('TOP_K', 3))
+MAX_TOP_K = int(os.environ.get('MAX_TOP_K', 5))
+
+# Best-candidate probability below which the nutrition lookup is left to the client,
+# which confirms a candidate and asks /nutrition; 0 turns the gate off
+CONFIDENCE_THRESHOLD = float(os.environ.get('CONFIDENCE_THRESHOLD', 0.2))
+
+
+def top_k_labels(probabilities, k):
+    """Indices of the k most probable classes, most probable first"""
+    k = min(k, len(probabilities))
+    top = np.argpartition(-probabilities, k - 1)[:k]
+    return top[np.argsort(-probabilities[top], kind='stable')]
+
+
+class RecognitionPipeline:
+    """
+    Food recognition pipeline run on a background event loop.
+
+    A request goes through three stages: image decoding on a thread pool, model
+    inference in micro-batches shared with concurrent requests on a single dedicated
+    thread, and the nutrition lookup as a non-blocking HTTP call. Flask handlers submit
+    work from their own threads and wait on the returned future, so many requests can
+    be waiting on Gemini at once without each holding a decode or inference thread.
+    """
+
+    def __init__(self, model, labels, calorie_base_label, nutrition_client, preprocess,
+                 decode_workers=DECODE_WORKERS, max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                 max_wait_ms=INFERENCE_MAX_WAIT_MS, input_scale=1.0, top_k=TOP_K,
+                 confidence_threshold=CONFIDENCE_THRESHOLD):
+        """
+        Parameters:
+        -----------
+        model : KerasBackend or TFLiteBackend
+            Food classifier, see backends.py
+        labels : list of str
+            Class names in the model's output order
+        calorie_base_label : dict
+            Labels measured per piece rather than per serving
+        nutrition_client : NutritionClient
+            Async nutrition lookup
+        preprocess : callable
+            Decodes uploaded image bytes into (1, H, W, 3) uint8 pixels
+        decode_workers : int
+            Threads decoding images
+        max_batch_size, max_wait_ms : int, float
+            Micro-batching limits, see InferenceBatcher
+        input_scale : float
+            Factor turning pixels into model inputs, e.g. 1/255
+        top_k : int
+            Candidate labels returned per image unless a request asks for another number
+        confidence_threshold : float
+            Below this best-candidate probability no nutrition is looked up, 0 always looks it up
+        """
+        self.model = model
+        self.labels = labels
+        self.calorie_base_label = calorie_base_label
+        self.nutrition_client = nutrition_client
+        self.preprocess = preprocess
+        self.top_k = top_k
+        self.confidence_threshold = confidence_threshold
+
+        self._decode_executor = ThreadPoolExecutor(decode_workers, thread_name_prefix='decode')
+        self._inference_executor = ThreadPoolExecutor(1, thread_name_prefix='inference')
+        self.batcher = InferenceBatcher(
+            self._predict, self._inference_executor, max_batch_size, max_wait_ms, input_scale
+        )
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='pipeline-loop', daemon=True)
+        self._thread.start()
+
+    def _predict(self, inputs):
+        return self.model.predict(inputs)
+
+    def submit(self, image_data, top_k=None):
+        """Start processing uploaded image bytes, returns a concurrent.futures.Future of the result dict"""
+        return asyncio.run_coroutine_threadsafe(self.process(image_data, top_k), self.loop)
+
+    async def process(self, image_data, top_k=None):
+        loop = asyncio.get_running_loop()
+        top_k = min(top_k or self.top_k, MAX_TOP_K)
+
+        img_arr = await loop.run_in_executor(self._decode_executor, self.preprocess, image_data)
+        preds = await self.batcher.submit(img_arr)
+
+        probabilities = preds[0]
+        candidates = [
+            {
+                'food': self.labels[idx],
+                'confidence': float(probabilities[idx]),
+                'is_piecewise': self._is_piecewise(self.labels[idx])
+            }
+            for idx in top_k_labels(probabilities, top_k)
+        ]
+
+        # Only the best candidate is worth an upstream call, and only if it is likely
+        # right; the client can confirm any candidate and fetch it from /nutrition
+        best = candidates[0]
+        low_confidence = best['confidence'] < self.confidence_threshold
+        if not low_confidence:
+            best.update(await self.nutrition_client.lookup(best['food'], best['is_piecewise']))
+
+        # The best candidate stays at the top level, as before
+        result = dict(candidates[0])
+        result['candidates'] = candidates
+        result['low_confidence'] = low_confidence
+        return result
+
+    def _is_piecewise(self, food):
+        # Determine if piecewise or serving
+        return self.calorie_base_label.get(food, 'serving') == 'piece'
+
+    def lookup_nutrition(self, food):
+        """Start a nutrition lookup for a label, returns a concurrent.futures.Future of the result dict"""
+        async def lookup():
+            is_piecewise = self._is_piecewise(food)
+            result = {'food': food, 'is_piecewise': is_piecewise}
+            result.update(await self.nutrition_client.lookup(food, is_piecewise))
+            return result
+
+        return asyncio.run_coroutine_threadsafe(lookup(), self.loop)
+
+    def metrics(self):
+        """Batch size, queue wait and inference time of the inference stage"""
+        return self.batcher.metrics.snapshot()
+
+    def shutdown(self):
+        """Close the HTTP client and stop the loop and executors"""
+        asyncio.run_coroutine_threadsafe(self.batcher.close(), self.loop).result()
+        asyncio.run_coroutine_threadsafe(self.nutrition_client.close(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self._decode_executor.shutdown()
+        self._inference_executor.shutdown()
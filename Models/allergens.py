@@ -0,0 +1,85 @@
+import ast
+import numpy as np
+
+# Entries in the allergens column that mean "no allergen"
+NO_ALLERGEN = {'', 'none', 'nan'}
+
+# Common ways users spell allergens, mapped onto the names used in the food database
+ALLERGEN_ALIASES = {
+    'nut': 'nuts',
+    'peanut': 'nuts',
+    'peanuts': 'nuts',
+    'tree nut': 'nuts',
+    'tree nuts': 'nuts',
+    'milk': 'dairy',
+    'lactose': 'dairy',
+    'egg': 'eggs',
+    'soya': 'soy',
+    'soybean': 'soy',
+    'soybeans': 'soy',
+    'wheat': 'gluten',
+    'shrimp': 'shellfish',
+    'prawn': 'shellfish',
+    'prawns': 'shellfish',
+    'crab': 'shellfish',
+    'lobster': 'shellfish',
+}
+
+
+def normalize_allergen(name):
+    """Normalize an allergen name to the vocabulary used by the allergen matrix"""
+    key = str(name).strip().strip('\'"').strip().lower()
+    return ALLERGEN_ALIASES.get(key, key)
+
+
+def parse_allergen_list(value):
+    """
+    Parse one cell of the allergens column into a list of normalized allergen names.
+
+    The CSV stores stringified Python lists such as "['Nuts', 'None', 'Dairy']"; plain
+    comma-separated strings are accepted as well.
+    """
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return []
+
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        text = str(value).strip()
+        try:
+            items = ast.literal_eval(text) if text.startswith('[') else text.split(',')
+        except (ValueError, SyntaxError):
+            items = text.strip('[]').split(',')
+
+        if isinstance(items, str):
+            items = [items]
+
+    allergens = []
+    for item in items:
+        name = normalize_allergen(item)
+        if name not in NO_ALLERGEN and name not in allergens:
+            allergens.append(name)
+    return allergens
+
+
+def build_allergen_matrix(allergen_column):
+    """
+    Parse the allergens column into a vocabulary and a boolean (food x allergen) matrix.
+
+    Returns:
+    --------
+    vocabulary : list of str
+        Sorted normalized allergen names
+    matrix : numpy.ndarray
+        Boolean matrix where matrix[i, j] is True if food i contains vocabulary[j]
+    """
+    parsed = [parse_allergen_list(value) for value in allergen_column]
+    vocabulary = sorted({name for names in parsed for name in names})
+    positions = {name: j for j, name in enumerate(vocabulary)}
+
+    matrix = np.zeros((len(parsed), len(vocabulary)), dtype=bool)
+    for i, names in enumerate(parsed):
+        for name in names:
+            matrix[i, positions[name]] = True
+
+    return vocabulary, matrix
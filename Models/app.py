@@ -1,21 +1,44 @@
 import logging
 from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
+import numpy as np
 import pandas as pd
 import os
+import tempfile
 from datetime import datetime
 import json
 
+from food_store import FoodRecord
+from plan_cache import PlanCache, profile_fingerprint
+from response_format import InvalidFieldsError, compress, negotiate_encoding, representation, response_options
+from request_logging import configure_logging, init_request_logging
+
+class RecommendationJSONProvider(DefaultJSONProvider):
+    """JSON provider that serializes FoodRecord row views and NumPy scalars"""
+
+    @staticmethod
+    def default(obj):
+        if isinstance(obj, FoodRecord):
+            return obj.to_dict()
+        if isinstance(obj, np.generic):
+            return obj.item()
+        return DefaultJSONProvider.default(obj)
+
 # Initialize Flask app
 app = Flask(__name__)
+app.json = RecommendationJSONProvider(app)
 
 # Enable CORS for all routes
 CORS(app)
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+# Set up logging; LOG_LEVEL sets the level and LOG_FORMAT=json switches to JSON lines
+configure_logging(json_format=os.environ.get('LOG_FORMAT') == 'json')
 logger = logging.getLogger(__name__)
 
+# One structured log record per request
+init_request_logging(app)
+
 # Paths for food data and models
 food_data_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'seasonal_food_database.csv')
 models_dir = os.path.dirname(os.path.abspath(__file__))
@@ -34,6 +57,10 @@ except Exception as e:
     logger.info("Using fallback recommendation system")
     recommender = None
 
+# Serialized plans of recently submitted profiles, so an unchanged profile that is
+# submitted again is answered without running the planner
+plan_cache = PlanCache()
+
 # ============= FALLBACK RECOMMENDATION SYSTEM =============
 
 def calculate_bmr_fallback(age, sex, weight_kg, height_cm):
@@ -258,41 +285,100 @@ def index():
         "ml_model_available": recommender is not None
     })
 
+def build_user_profile(data):
+    """Extract and validate user profile data from a request payload"""
+    return {
+        'age': int(data.get('age', 0)),
+        'sex': data.get('sex', '').strip().lower(),
+        'weight_kg': float(data.get('weight_kg', 0)),
+        'height_cm': float(data.get('height_cm', 0)),
+        'activity_level': data.get('activity_level', '').strip(),
+        'goal': data.get('goal', '').strip(),
+        'diet_type': data.get('diet_type', '').strip(),
+        'allergies': data.get('allergies', []),
+        'cuisines': data.get('cuisines', {})
+    }
+
+# Values the foods of a response carry besides the store's columns, by route
+PLAN_FOOD_FIELDS = ('calorie_diff',)
+SEASONAL_FOOD_FIELDS = ('protein_ratio',)
+
+def projection_options(extra_fields):
+    """Field projection and compact flag of the request, checked against the food fields of the response"""
+    return response_options(request.args, set(recommender.store.column_names).union(extra_fields))
+
+def invalid_fields_response(error):
+    return jsonify({"error": str(error), "invalid_fields": error.invalid}), 400
+
+def save_user_profile(user_profile, path='user_profile.json'):
+    """Write the latest submitted profile; replaced atomically so concurrent requests never leave a partial file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.user_profile-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(user_profile, f, indent=4)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
 @app.route('/profile', methods=['POST'])
 def profile():
     """Handle profile submission and generate meal plan"""
     try:
         data = request.json
-        logger.debug(f"JSON data received: {data}")
         
         # Extract and validate user profile data
-        user_profile = {
-            'age': int(data.get('age', 0)),
-            'sex': data.get('sex', '').strip().lower(),
-            'weight_kg': float(data.get('weight_kg', 0)),
-            'height_cm': float(data.get('height_cm', 0)),
-            'activity_level': data.get('activity_level', '').strip(),
-            'goal': data.get('goal', '').strip(),
-            'diet_type': data.get('diet_type', '').strip(),
-            'allergies': data.get('allergies', []),
-            'cuisines': data.get('cuisines', {})
-        }
-        
-        logger.debug(f"Constructed User Profile: {user_profile}")
+        user_profile = build_user_profile(data)
         
         # Save profile
-        with open('user_profile.json', 'w') as f:
-            json.dump(user_profile, f, indent=4)
+        save_user_profile(user_profile)
         logger.info("User profile saved successfully.")
         
         # Generate meal plan (use ML model if available, otherwise fallback)
         if recommender:
             try:
-                daily_plan = recommender.recommend_daily_meals(user_profile)
-                logger.info("Meal plan generated using ML model")
-            except Exception as e:
-                logger.error(f"ML model failed: {e}. Using fallback.")
-                daily_plan = generate_fallback_meal_plan(user_profile)
+                fields, compact = projection_options(PLAN_FOOD_FIELDS)
+            except InvalidFieldsError as e:
+                return invalid_fields_response(e)
+            encoding = negotiate_encoding(request.accept_encodings)
+
+            # The plan only changes with the profile, the season and the food store;
+            # every projection and content coding of it is a representation of its own
+            season = user_profile.get('season') or recommender.determine_current_season()
+            plan_cache.sync(recommender.store_version)
+            plain_etag = profile_fingerprint(
+                user_profile, season, recommender.store_version, representation=representation(fields, compact)
+            )
+            etag = f"{plain_etag}-{encoding}" if encoding else plain_etag
+
+            # The client already has this exact plan
+            if request.if_none_match.contains(etag):
+                return encoded_response(b'', encoding, etag, 304)
+
+            body = plan_cache.get(etag)
+            if body is not None:
+                return encoded_response(body, encoding, etag)
+
+            # Another coding of the same plan only needs compressing
+            plain = plan_cache.get(plain_etag) if encoding else None
+            if plain is None:
+                try:
+                    daily_plan = recommender.recommend_daily_meals(user_profile)
+                    logger.info("Meal plan generated using ML model")
+                except Exception as e:
+                    logger.error(f"ML model failed: {e}. Using fallback.")
+                    daily_plan = generate_fallback_meal_plan(user_profile)
+                    daily_plan['user_profile'] = user_profile
+                    return jsonify(daily_plan), 200
+
+                daily_plan['user_profile'] = user_profile
+                plain = plan_cache.put(
+                    plain_etag, recommender.response_encoder.encode(daily_plan, fields, compact)
+                )
+
+            body = plan_cache.put(etag, compress(plain, encoding)) if encoding else plain
+            return encoded_response(body, encoding, etag)
         else:
             logger.info("Using fallback meal plan generation")
             daily_plan = generate_fallback_meal_plan(user_profile)
@@ -306,6 +392,63 @@ def profile():
         logger.exception("Error in /profile route")
         return jsonify({"error": f"Server error: {str(e)}"}), 500
 
+def encoded_response(body, encoding=None, etag=None, status=200):
+    """
+    JSON response from encoded, possibly compressed bytes. With an ETag clients must
+    revalidate it before reusing a stored copy.
+    """
+    response = app.response_class(body, status=status, mimetype='application/json')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    if etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@app.route('/profile/batch', methods=['POST'])
+def profile_batch():
+    """Generate meal plans for many profiles in one call"""
+    try:
+        data = request.json
+        profiles_data = data.get('profiles', []) if isinstance(data, dict) else data
+
+        if not isinstance(profiles_data, list):
+            return jsonify({"error": "Expected a list of profiles"}), 400
+
+        # Validate every profile, keeping per-profile errors instead of failing the batch
+        plans = [None] * len(profiles_data)
+        user_profiles = []
+        positions = []
+        for i, profile_data in enumerate(profiles_data):
+            try:
+                user_profiles.append(build_user_profile(profile_data))
+                positions.append(i)
+            except (AttributeError, TypeError, ValueError) as e:
+                plans[i] = {"error": f"Invalid profile: {str(e)}"}
+
+        logger.info(f"Generating {len(user_profiles)} meal plans in batch")
+
+        # Generate meal plans (use ML model if available, otherwise fallback)
+        if recommender:
+            try:
+                batch_plans = recommender.recommend_daily_meals_batch(user_profiles)
+            except Exception as e:
+                logger.error(f"ML model batch failed: {e}. Using fallback.")
+                batch_plans = [generate_fallback_meal_plan(p) for p in user_profiles]
+        else:
+            batch_plans = [generate_fallback_meal_plan(p) for p in user_profiles]
+
+        for i, user_profile, daily_plan in zip(positions, user_profiles, batch_plans):
+            daily_plan['user_profile'] = user_profile
+            plans[i] = daily_plan
+
+        return jsonify({"plans": plans}), 200
+
+    except Exception as e:
+        logger.exception("Error in /profile/batch route")
+        return jsonify({"error": f"Server error: {str(e)}"}), 500
+
 @app.route('/seasonal', methods=['GET'])
 def seasonal():
     """Get seasonal recommendations"""
@@ -316,13 +459,20 @@ def seasonal():
         cuisines = [c.strip() for c in cuisines_str.split(',') if c.strip()] if cuisines_str else None
         
         if recommender:
+            try:
+                fields, compact = projection_options(SEASONAL_FOOD_FIELDS)
+            except InvalidFieldsError as e:
+                return invalid_fields_response(e)
+
             try:
                 seasonal_data = recommender.get_seasonal_recommendations(
                     diet_type=diet_type,
                     meal_type=meal_type,
                     cuisines=cuisines
                 )
-                return jsonify(seasonal_data), 200
+                encoding = negotiate_encoding(request.accept_encodings)
+                body = recommender.response_encoder.encode(seasonal_data, fields, compact)
+                return encoded_response(compress(body, encoding), encoding)
             except Exception as e:
                 logger.error(f"ML model seasonal recommendations failed: {e}")
                 # Fall through to fallback
@@ -347,6 +497,9 @@ def health():
     return jsonify({
         "status": "healthy",
         "ml_model": "available" if recommender else "using_fallback",
+        "artifacts": recommender.artifact_status() if recommender else {},
+        "filter_cache": recommender.filter_cache.stats() if recommender else {},
+        "plan_cache": plan_cache.stats(),
         "timestamp": datetime.now().isoformat()
     })
 
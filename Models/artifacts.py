@@ -0,0 +1,110 @@
+import logging
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+
+class ArtifactUnavailableError(Exception):
+    """Raised when a model artifact is missing or failed to load"""
+
+
+class LazyArtifact:
+    """A pickled model file that is loaded on first access and then kept in memory"""
+
+    def __init__(self, name, path, loader=joblib.load):
+        """
+        Parameters:
+        -----------
+        name : str
+            Name reported in status and logs
+        path : str
+            File to load
+        loader : callable
+            Function that loads the file, joblib.load by default
+        """
+        self.name = name
+        self.path = path
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self._loaded = False
+        self._error = None
+        self._load_time_ms = None
+
+    def get(self):
+        """Return the loaded object, loading it on the first call"""
+        if not self._loaded and self._error is None:
+            with self._lock:
+                if not self._loaded and self._error is None:
+                    self._load()
+
+        if self._error is not None:
+            raise ArtifactUnavailableError(f"{self.name} is unavailable: {self._error}")
+        return self._value
+
+    def _load(self):
+        start = time.perf_counter()
+        try:
+            self._value = self._loader(self.path)
+            self._loaded = True
+        except Exception as e:
+            self._error = f"{type(e).__name__}: {e}"
+            logger.error(f"Failed to load {self.name} from {self.path}: {self._error}")
+        finally:
+            self._load_time_ms = round((time.perf_counter() - start) * 1000, 2)
+
+        if self._loaded:
+            logger.info(f"Loaded {self.name} from {os.path.basename(self.path)} in {self._load_time_ms} ms")
+
+    @property
+    def loaded(self):
+        """True once the artifact has been loaded"""
+        return self._loaded
+
+    @property
+    def available(self):
+        """True if the artifact is loaded or its file exists and has not failed to load"""
+        return self._loaded or (self._error is None and os.path.exists(self.path))
+
+    def status(self):
+        """Availability report for health checks"""
+        if self._loaded:
+            state = 'loaded'
+        elif self._error is not None:
+            state = 'failed'
+        elif os.path.exists(self.path):
+            state = 'not_loaded'
+        else:
+            state = 'missing'
+
+        report = {'status': state, 'path': self.path}
+        if self._load_time_ms is not None:
+            report['load_time_ms'] = self._load_time_ms
+        if self._error is not None:
+            report['error'] = self._error
+        return report
+
+
+class LazyArtifactMapping(Mapping):
+    """Read-only mapping of keys to LazyArtifacts that loads each value on first access"""
+
+    def __init__(self, artifacts):
+        self._artifacts = dict(artifacts)
+
+    def __getitem__(self, key):
+        return self._artifacts[key].get()
+
+    def __iter__(self):
+        return iter(self._artifacts)
+
+    def __len__(self):
+        return len(self._artifacts)
+
+    def artifact(self, key):
+        """The LazyArtifact behind a key, without loading it"""
+        return self._artifacts[key]
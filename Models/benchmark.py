@@ -0,0 +1,342 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from diet_recommendation_app import ACTIVITY_FACTORS, DietRecommendationApp, MEAL_DISTRIBUTION
+from selection import SCORERS
+
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+FOOD_DATA_PATH = os.path.join(MODELS_DIR, 'seasonal_food_database.csv')
+
+# Database sizes benchmarked by default, from about the real database up to 1M rows
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+# Timed calls per operation and per database size
+DEFAULT_ITERATIONS = 200
+
+# Calls traced for peak memory, kept low because tracing slows everything down
+MEMORY_ITERATIONS = 10
+
+# The neighbor index compares every food with every other one; above this many rows
+# building it would dominate the run, so similarity lookups are skipped
+SIMILARITY_MAX_ROWS = 100_000
+
+# Profiles per recommend_daily_meals_batch call
+BATCH_SIZE = 64
+
+# Numeric columns varied per synthetic food, and the columns that must stay integers
+JITTER_COLUMNS = ['calories', 'protein_g', 'fat_g', 'carbs_g', 'fiber_g', 'sugar_g', 'sodium_mg', 'cholesterol_mg']
+JITTER = 0.1
+
+# Profile mix: how often each diet, how many allergies and how many cuisines per meal
+DIET_TYPES = [None, 'Vegetarian', 'Vegan', 'Non-Vegetarian']
+DIET_WEIGHTS = [0.4, 0.25, 0.1, 0.25]
+ALLERGIES = ['nuts', 'peanuts', 'milk', 'dairy', 'gluten', 'eggs', 'soy', 'shellfish']
+ALLERGY_COUNT_WEIGHTS = [0.5, 0.3, 0.15, 0.05]
+CUISINE_COUNT_WEIGHTS = [0.4, 0.35, 0.2, 0.05]
+SEASONS = [None, 'spring', 'summer', 'fall', 'winter']
+ACTIVITY_LEVELS = list(ACTIVITY_FACTORS)
+GOALS = ['lose_weight', 'maintain', 'gain_weight']
+
+
+def synthesize_database(source, n_rows, seed=0):
+    """
+    Synthetic food database of n_rows with the schema of the real one.
+
+    Rows are drawn from the real database, so categories, flags, allergens and their
+    correlations keep their real distribution, and the nutrient values are jittered so
+    foods are not exact duplicates. Food ids and names are unique.
+    """
+    rng = np.random.default_rng(seed)
+    foods = source.iloc[rng.integers(0, len(source), n_rows)].reset_index(drop=True)
+
+    for column in JITTER_COLUMNS:
+        values = foods[column].to_numpy(dtype=float) * rng.normal(1, JITTER, n_rows)
+        foods[column] = np.round(np.clip(values, 0, None), 1)
+
+    foods['food_name'] = foods['food_name'] + ' #' + pd.Series(np.arange(n_rows)).astype(str)
+    foods['food_id'] = np.arange(1, n_rows + 1, dtype=np.int64)
+    return foods
+
+
+def generate_profiles(source, n_profiles, seed=0):
+    """Representative user profiles mixing diets, allergies, cuisines per meal and goals"""
+    rng = np.random.default_rng(seed)
+    cuisines = sorted(source['cuisine_type'].dropna().unique())
+
+    def pick(options, count):
+        return [str(option) for option in rng.choice(options, count, replace=False)]
+
+    profiles = []
+    for _ in range(n_profiles):
+        profile = {
+            'age': int(rng.integers(18, 75)),
+            'sex': str(rng.choice(['male', 'female'])),
+            'weight_kg': round(float(rng.uniform(45, 120)), 1),
+            'height_cm': round(float(rng.uniform(150, 200)), 1),
+            'activity_level': str(rng.choice(ACTIVITY_LEVELS)),
+            'goal': str(rng.choice(GOALS)),
+            'diet_type': DIET_TYPES[rng.choice(len(DIET_TYPES), p=DIET_WEIGHTS)],
+            'allergies': pick(ALLERGIES, rng.choice(len(ALLERGY_COUNT_WEIGHTS), p=ALLERGY_COUNT_WEIGHTS)),
+            'cuisines': {},
+        }
+        for meal in MEAL_DISTRIBUTION:
+            count = rng.choice(len(CUISINE_COUNT_WEIGHTS), p=CUISINE_COUNT_WEIGHTS)
+            if count:
+                profile['cuisines'][meal] = pick(cuisines, count)
+        season = SEASONS[rng.integers(len(SEASONS))]
+        if season:
+            profile['season'] = season
+        profiles.append(profile)
+    return profiles
+
+
+def _link_artifacts(models_dir, work_dir, with_scaler):
+    """
+    Point work_dir at the trained models, so the recommender's own files (neighbor
+    index, snapshot) are written there and never over the real ones. Leaving out the
+    scaler disables the scaled features and with them the neighbor index.
+    """
+    for name in os.listdir(models_dir):
+        if not name.endswith('.pkl') or (name == 'food_scaler.pkl' and not with_scaler):
+            continue
+        os.symlink(os.path.join(models_dir, name), os.path.join(work_dir, name))
+
+
+def _summary(samples_ms):
+    values = np.asarray(samples_ms)
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 4),
+        'p99_ms': round(float(np.percentile(values, 99)), 4),
+        'mean_ms': round(float(values.mean()), 4),
+        'max_ms': round(float(values.max()), 4),
+    }
+
+
+def measure(operation, arguments, iterations, setup=None, items_per_call=1):
+    """
+    Latency percentiles, throughput and traced peak memory of operation(argument).
+
+    Arguments are cycled through for iterations timed calls after one warm-up call;
+    setup, if given, runs before every call outside the timer. Peak memory is the
+    largest Python allocation made by a single call, over a few separately traced calls.
+    """
+    def call(i):
+        argument = arguments[i % len(arguments)]
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        operation(argument)
+        return time.perf_counter() - started
+
+    call(0)
+    samples = [call(i) for i in range(iterations)]
+
+    peaks = []
+    tracemalloc.start()
+    for i in range(min(MEMORY_ITERATIONS, iterations)):
+        argument = arguments[i % len(arguments)]
+        if setup is not None:
+            setup()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        operation(argument)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+
+    result = _summary([sample * 1000 for sample in samples])
+    result['calls'] = iterations
+    result['throughput_per_s'] = round(iterations * items_per_call / sum(samples), 2)
+    result['peak_memory_kib'] = round(max(peaks) / 1024, 1)
+    return result
+
+
+def _filter_arguments(profiles):
+    arguments = []
+    for profile in profiles:
+        for meal in MEAL_DISTRIBUTION:
+            arguments.append((
+                profile['diet_type'], meal, profile.get('season', 'spring'),
+                profile['cuisines'].get(meal), profile['allergies']
+            ))
+    return arguments
+
+
+def benchmark_size(source, n_rows, models_dir, profiles, iterations, seed=0,
+                   similarity_max_rows=SIMILARITY_MAX_ROWS):
+    """Build a recommender over a synthetic database of n_rows and time every operation on it"""
+    with tempfile.TemporaryDirectory(prefix='calorix-bench-') as work_dir:
+        food_data_path = os.path.join(work_dir, 'foods.csv')
+        synthesize_database(source, n_rows, seed).to_csv(food_data_path, index=False)
+
+        with_similarity = n_rows <= similarity_max_rows
+        _link_artifacts(models_dir, work_dir, with_scaler=with_similarity)
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        app = DietRecommendationApp(food_data_path, work_dir, use_snapshot=False)
+        startup_seconds = time.perf_counter() - started
+        startup_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        result = {
+            'rows': n_rows,
+            'startup_seconds': round(startup_seconds, 3),
+            'startup_peak_memory_mib': round(startup_peak / 2 ** 20, 1),
+            'operations': {},
+        }
+        operations = result['operations']
+
+        # Filtering is timed in its parts: resolving the matching rows (what the filter
+        # cache saves), materializing them as a frame, and the public call doing both
+        filters = _filter_arguments(profiles)
+        operations['filter_resolve'] = measure(
+            lambda args: app._filter(*args), filters, iterations,
+            setup=app.filter_cache.invalidate
+        )
+        operations['filter'] = measure(
+            lambda args: app.filter_foods_by_constraints(*args), filters, iterations,
+            setup=app.filter_cache.invalidate
+        )
+
+        # Resolving every filter once also warms the cache, so the cached timings below
+        # are hits even when there are more distinct filters than iterations
+        filtered_rows = [app._filter(*args).rows for args in filters]
+        operations['to_frame'] = measure(app.store.to_frame, filtered_rows, iterations)
+        operations['filter_resolve_cached'] = measure(
+            lambda args: app._filter(*args), filters, iterations
+        )
+        operations['filter_cached'] = measure(
+            lambda args: app.filter_foods_by_constraints(*args), filters, iterations
+        )
+
+        rankings = list(SCORERS)
+        ranked_profiles = [(profile, rankings[i % len(rankings)]) for i, profile in enumerate(profiles)]
+        operations['recommend_daily_meals'] = measure(
+            lambda args: app.recommend_daily_meals(*args), ranked_profiles, iterations,
+            setup=app.filter_cache.invalidate
+        )
+
+        batches = [profiles[i:i + BATCH_SIZE] for i in range(0, len(profiles), BATCH_SIZE)]
+        operations['recommend_daily_meals_batch'] = measure(
+            app.recommend_daily_meals_batch, batches, max(1, iterations // 10),
+            setup=app.filter_cache.invalidate, items_per_call=BATCH_SIZE
+        )
+
+        # The neighbor index is built on the first similarity lookup, not at startup
+        started = time.perf_counter()
+        neighbor_index = app.neighbor_index
+        result['neighbor_index_seconds'] = round(time.perf_counter() - started, 3)
+
+        if neighbor_index is not None:
+            food_ids = np.random.default_rng(seed).choice(app.store.columns['food_id'], iterations)
+            operations['get_similar_foods'] = measure(app.get_similar_foods, list(food_ids), iterations)
+        else:
+            operations['get_similar_foods'] = {'skipped': f"neighbor index not built above {similarity_max_rows} rows"}
+
+        plans = [app.recommend_daily_meals(profile) for profile in profiles[:50]]
+        operations['make_serializable'] = measure(app._make_serializable, plans, iterations)
+        operations['serialize_json'] = measure(
+            lambda plan: json.dumps(app._make_serializable(plan)), plans, iterations
+        )
+        operations['response_encoder'] = measure(app.response_encoder.encode, plans, iterations)
+
+        return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=MODELS_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, iterations=DEFAULT_ITERATIONS, n_profiles=200, seed=0, models_dir=MODELS_DIR,
+        food_data_path=FOOD_DATA_PATH, similarity_max_rows=SIMILARITY_MAX_ROWS):
+    """Benchmark every database size, returns the JSON-ready report"""
+    source = pd.read_csv(food_data_path)
+    profiles = generate_profiles(source, n_profiles, seed)
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': seed,
+            'iterations': iterations,
+            'profiles': n_profiles,
+        },
+        'results': {},
+    }
+    for n_rows in sizes:
+        print(f"Benchmarking {n_rows} rows...", file=sys.stderr)
+        report['results'][str(n_rows)] = benchmark_size(
+            source, n_rows, models_dir, profiles, iterations, seed, similarity_max_rows
+        )
+
+    # Peak resident memory of the whole run, in KiB on Linux
+    report['meta']['max_rss_mib'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return report
+
+
+def compare(baseline, current):
+    """Lines with the p50 and p99 change of every operation measured in both reports"""
+    lines = []
+    for size, result in current['results'].items():
+        before = baseline['results'].get(size)
+        if before is None:
+            continue
+        for name, stats in result['operations'].items():
+            old = before['operations'].get(name, {})
+            if 'p50_ms' not in stats or 'p50_ms' not in old:
+                continue
+            changes = [
+                f"{key[:3]} {old[key]:.3f} -> {stats[key]:.3f} ms ({(stats[key] / old[key] - 1) * 100:+.1f}%)"
+                for key in ('p50_ms', 'p99_ms')
+            ]
+            lines.append(f"{size:>8} {name:<28} " + '  '.join(changes))
+    return lines
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark DietRecommendationApp on synthetic food databases")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Database sizes in rows")
+    parser.add_argument('--iterations', type=int, default=DEFAULT_ITERATIONS, help="Timed calls per operation")
+    parser.add_argument('--profiles', type=int, default=200, help="Distinct user profiles in the mix")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--models-dir', default=MODELS_DIR, help="Directory with the trained .pkl models")
+    parser.add_argument('--similarity-max-rows', type=int, default=SIMILARITY_MAX_ROWS,
+                        help="Largest database the neighbor index is built for")
+    parser.add_argument('--output', help="JSON report, defaults to benchmark_<timestamp>.json")
+    parser.add_argument('--compare', metavar='BASELINE', help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.iterations, args.profiles, args.seed, args.models_dir,
+                 similarity_max_rows=args.similarity_max_rows)
+
+    output = args.output or f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved benchmark report to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            for line in compare(json.load(f), report):
+                print(line)
@@ -0,0 +1,134 @@
+import numpy as np
+
+from allergens import normalize_allergen
+
+# Number of set bits for every possible byte value, used to popcount packed bitsets
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner', 'snack']
+SEASONS = ['spring', 'summer', 'fall', 'winter']
+
+
+def pack_mask(mask):
+    """Pack a boolean row mask into an array of 64-bit words (little-endian bit order)"""
+    packed = np.packbits(np.asarray(mask, dtype=bool), bitorder='little')
+
+    # Pad to a whole number of 64-bit words so the bytes can be viewed as uint64
+    padding = (-len(packed)) % 8
+    if padding:
+        packed = np.concatenate([packed, np.zeros(padding, dtype=np.uint8)])
+
+    return packed.view(np.uint64)
+
+
+def unpack_bits(bits, n_rows):
+    """Expand packed words back into a boolean row mask of length n_rows"""
+    return np.unpackbits(bits.view(np.uint8), count=n_rows, bitorder='little').astype(bool)
+
+
+def count_bits(bits):
+    """Count the rows selected by a packed bitset"""
+    return int(_POPCOUNT[bits.view(np.uint8)].sum())
+
+
+class ConstraintIndex:
+    """
+    Packed bitsets over the constraint columns of the food database.
+
+    Built once when the food database is loaded. Each diet type, meal suitability
+    flag, season, cuisine and allergen gets one bitset with a bit per food row, so
+    filtering a request is a handful of AND / ANDNOT operations over uint64 words and
+    rows only need to be materialized for the final candidates.
+    """
+
+    def __init__(self, store, allergen_vocabulary=None, allergen_matrix=None):
+        """
+        Build the bitsets for a food database.
+
+        Parameters:
+        -----------
+        store : FoodStore
+            The food database, one row per food
+        allergen_vocabulary : list of str
+            Normalized allergen names, one per column of allergen_matrix
+        allergen_matrix : numpy.ndarray
+            Boolean (food x allergen) matrix parsed from the allergens column
+        """
+        self.n_rows = len(store)
+        self.all_rows = pack_mask(np.ones(self.n_rows, dtype=bool))
+        self.no_rows = pack_mask(np.zeros(self.n_rows, dtype=bool))
+
+        # Diet types, with a lowercase variant for case-insensitive lookups
+        self.diet_types = self._build_value_bitsets(store, 'diet_type')
+        self.diet_types_lower = {}
+        for value, bits in self.diet_types.items():
+            key = value.lower()
+            self.diet_types_lower[key] = self.diet_types_lower.get(key, self.no_rows) | bits
+
+        # Meal suitability flags and seasons are 0/1 columns
+        self.meal_types = {
+            meal: pack_mask(store.columns[f'suitable_{meal}'] == 1)
+            for meal in MEAL_TYPES if store.has_column(f'suitable_{meal}')
+        }
+        self.seasons = {
+            season: pack_mask(store.columns[season] == 1)
+            for season in SEASONS if store.has_column(season)
+        }
+
+        self.cuisines = self._build_value_bitsets(store, 'cuisine_type')
+
+        # One bitset per column of the parsed allergen matrix
+        self.allergens = {}
+        if allergen_vocabulary:
+            for j, allergen in enumerate(allergen_vocabulary):
+                self.allergens[allergen] = pack_mask(allergen_matrix[:, j])
+
+    def _build_value_bitsets(self, store, column):
+        """Build one bitset per distinct value of a categorical column"""
+        if not store.has_column(column):
+            return {}
+
+        codes = store.columns[column]
+        return {value: pack_mask(codes == code) for code, value in enumerate(store.categories[column])}
+
+    def diet(self, diet_type):
+        """Bitset for a diet type, falling back to a case-insensitive match, or None if unknown"""
+        bits = self.diet_types.get(diet_type)
+        if bits is not None and bits.any():
+            return bits
+
+        return self.diet_types_lower.get(diet_type.lower())
+
+    def meal(self, meal_type):
+        """Bitset of foods suitable for a meal type, or None if there is no flag column for it"""
+        return self.meal_types.get(meal_type.lower())
+
+    def season(self, season):
+        """Bitset of foods available in a season, or None if the season is unknown"""
+        return self.seasons.get(season)
+
+    def cuisine(self, cuisines):
+        """Bitset of foods belonging to any of the given cuisines"""
+        bits = self.no_rows
+        for cuisine in cuisines:
+            if cuisine in self.cuisines:
+                bits = bits | self.cuisines[cuisine]
+        return bits
+
+    def allergen(self, allergens):
+        """Bitset of foods containing any of the given allergens"""
+        bits = self.no_rows
+        for allergen in allergens:
+            if not allergen or allergen.strip() == '':
+                continue
+
+            # Allergens nobody in the database contains exclude nothing
+            allergen_bits = self.allergens.get(normalize_allergen(allergen))
+            if allergen_bits is not None:
+                bits = bits | allergen_bits
+
+        return bits
+
+    def rows(self, bits):
+        """Positional row indices of the foods selected by a bitset"""
+        return np.flatnonzero(unpack_bits(bits, self.n_rows))
@@ -1,18 +1,55 @@
 
 import pandas as pd
 import numpy as np
-import joblib
-import re
-import json
+import hashlib
+import os
 from datetime import datetime
 
+from allergens import build_allergen_matrix
+from artifacts import ArtifactUnavailableError, LazyArtifact, LazyArtifactMapping
+from constraint_index import ConstraintIndex
+from filter_cache import DEFAULT_MAXSIZE, FilterCache, filter_key
+from food_store import FoodRecord, FoodStore
+from json_encoding import ResponseEncoder
+from ingestion import MEAL_TYPES, fill_suitability_flags, predict_meal_suitability, prepare_import
+from neighbor_index import NeighborIndex, features_hash
+from plan_store import PLAN_STORE_DIR, PlanStore
+from relaxation import resolve
+from seasonal_ranking import SeasonalRanking
+from selection import MACRO_COLUMNS, get_scorer, top_k, top_k_rows
+from snapshot import Snapshot, StaleSnapshotError, source_hash, source_stamp, write_snapshot
+
+# Default snapshot file name inside the models directory
+SNAPSHOT_FILE = 'food_snapshot.bin'
+
+# User that saved meal plans belong to when none is given
+DEFAULT_USER_ID = 'default'
+
+# Activity multipliers applied to BMR to get TDEE
+ACTIVITY_FACTORS = {
+    'sedentary': 1.2,      # Little or no exercise
+    'light': 1.375,        # Light exercise 1-3 days/week
+    'moderate': 1.55,      # Moderate exercise 3-5 days/week
+    'active': 1.725,       # Hard exercise 6-7 days/week
+    'very_active': 1.9     # Very hard exercise & physical job or 2x training
+}
+
+# Meal distribution (percentage of daily calories)
+MEAL_DISTRIBUTION = {
+    'breakfast': 0.25,
+    'lunch': 0.35,
+    'dinner': 0.30,
+    'snack': 0.10
+}
+
 class DietRecommendationApp:
     """
     A standalone diet recommendation system that uses pre-trained models
     to provide personalized meal plans based on user profiles.
     """
 
-    def __init__(self, food_data_path, models_dir="./"):
+    def __init__(self, food_data_path, models_dir="./", use_snapshot=True, snapshot_path=None,
+                 filter_cache_size=DEFAULT_MAXSIZE, plan_store_dir=PLAN_STORE_DIR):
         """
         Initialize the recommendation system by loading the food database and model files.
 
@@ -22,58 +59,302 @@ class DietRecommendationApp:
             Path to the food database CSV file
         models_dir : str
             Directory containing the pickled model files
+        use_snapshot : bool
+            Load the preprocessed food database from a snapshot file when it is up to
+            date with the CSV and models, and write a fresh one when it is not, once the
+            neighbor index has been built on first use or by load_artifacts()
+        snapshot_path : str
+            Snapshot file, defaults to food_snapshot.bin in models_dir
+        filter_cache_size : int
+            Number of distinct constraint combinations whose filter results are cached,
+            0 disables the cache
+        plan_store_dir : str
+            Directory of the store that saved meal plans are appended to
         """
-        # Load the food database
-        self.food_df = pd.read_csv(food_data_path)
+        snapshot = None
+        if use_snapshot:
+            snapshot_path = snapshot_path or os.path.join(models_dir, SNAPSHOT_FILE)
+            snapshot = self._open_snapshot(food_data_path, models_dir, snapshot_path)
+
+        if snapshot is not None:
+            # Preprocessed columns and allergen matrix are memory-mapped from the snapshot
+            self.store = snapshot.store
+            self.allergen_vocabulary = snapshot.allergen_vocabulary
+            self.allergen_matrix = snapshot.allergen_matrix
+        else:
+            # Load the food database into a columnar store
+            self.store = FoodStore.from_csv(food_data_path)
+            self.allergen_vocabulary, self.allergen_matrix = self._build_allergen_matrix()
+
+        # Foods from the database have known flags, so their suitability is certain
+        for meal_type in MEAL_TYPES:
+            self.store.add_column(
+                f'suitability_{meal_type}',
+                self.store.columns[f'suitable_{meal_type}'].astype(np.float32)
+            )
+
+        # Filter results for recently used constraint combinations
+        self.filter_cache = FilterCache(filter_cache_size)
+
+        # Saved meal plans; the store is opened on first use
+        self.plan_store_dir = plan_store_dir
+        self._plan_store = None
+
+        # The database file and how often the store was re-indexed since loading it
+        # version everything derived from the store, e.g. cached meal plans
+        stat = os.stat(food_data_path)
+        self._data_stamp = hashlib.sha256(
+            f"{os.path.abspath(food_data_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode()
+        ).hexdigest()[:12]
+        self._store_generation = 0
+
+        self._index_store()
         
-        # Load models and encoders
-        try:
-            self.encoder = joblib.load(f"{models_dir}/food_encoder.pkl")
-            self.scaler = joblib.load(f"{models_dir}/food_scaler.pkl")
-            self.kmeans = joblib.load(f"{models_dir}/food_clusters.pkl")
-
-            # Load meal type predictors
-            self.meal_predictors = {}
-            for meal_type in ['breakfast', 'lunch', 'dinner', 'snack']:
-                self.meal_predictors[meal_type] = joblib.load(f"{models_dir}/{meal_type}_predictor.pkl")
-        except FileNotFoundError as e:
-            print(f"Error loading model files: {e}")
-            print("Make sure you've run the training code first to generate the model files.")
-            raise
-
-        # Load similarity matrix if available, otherwise compute it
+        # Models and encoders are loaded lazily on first use, so a missing or broken file
+        # only disables the feature that needs it instead of the whole recommender
+        self.artifacts = {
+            'encoder': LazyArtifact('encoder', f"{models_dir}/food_encoder.pkl"),
+            'scaler': LazyArtifact('scaler', f"{models_dir}/food_scaler.pkl"),
+            'kmeans': LazyArtifact('kmeans', f"{models_dir}/food_clusters.pkl"),
+        }
+
+        # Meal type predictors
+        self.meal_predictors = LazyArtifactMapping({
+            meal_type: LazyArtifact(f"{meal_type}_predictor", f"{models_dir}/{meal_type}_predictor.pkl")
+            for meal_type in MEAL_TYPES
+        })
+
+        # Scaled features and the neighbor index over them are only needed for similar
+        # food lookups, so they are built or mapped from the snapshot on first use too
+        if snapshot is not None:
+            self._similarity = LazyArtifact(
+                'neighbor_index', snapshot_path,
+                loader=lambda path: {'features': snapshot.features, 'neighbor_index': snapshot.neighbor_index}
+            )
+        else:
+            self._similarity = LazyArtifact(
+                'neighbor_index', f"{models_dir}/neighbor_index.npz",
+                loader=lambda path: self._build_similarity(path, food_data_path, models_dir,
+                                                           snapshot_path if use_snapshot else None)
+            )
+
+    def _build_similarity(self, neighbor_index_path, food_data_path, models_dir, snapshot_path=None):
+        """
+        Scale the features and load or build their neighbor index.
+
+        Raises ArtifactUnavailableError without the scaler. With a snapshot_path, a fresh
+        snapshot is saved so the next start can skip loading the CSV and models.
+        """
+        features = self._scaled_features()
+
+        # Load the top-K neighbor index if available, otherwise build it
         try:
-            self.similarity_matrix = joblib.load(f"{models_dir}/similarity_matrix.pkl")
+            neighbor_index = NeighborIndex.load(neighbor_index_path)
         except FileNotFoundError:
-            self.similarity_matrix = self._compute_similarity_matrix()
-            joblib.dump(self.similarity_matrix, f"{models_dir}/similarity_matrix.pkl")
+            neighbor_index = None
+
+        # The index is only reused for the features it was built from; rows edited in
+        # place would leave it pointing at the wrong foods
+        if (neighbor_index is None or neighbor_index.n_rows > len(self.store)
+                or neighbor_index.source_hash != features_hash(features[:neighbor_index.n_rows])):
+            neighbor_index = NeighborIndex.build(features)
+            neighbor_index.save(neighbor_index_path)
+        elif neighbor_index.n_rows < len(self.store):
+            # Foods were appended to the database, index only the new rows
+            neighbor_index.add(features[neighbor_index.n_rows:], source_hash=features_hash(features))
+            neighbor_index.save(neighbor_index_path)
+
+        # The snapshot must match the CSV, so skip it once foods have been ingested
+        if snapshot_path is not None and self._store_generation == 1:
+            try:
+                stamp = source_stamp(food_data_path, models_dir)
+                write_snapshot(
+                    snapshot_path, self.store, self.allergen_vocabulary, self.allergen_matrix,
+                    features, neighbor_index, source_hash(food_data_path, models_dir), stamp
+                )
+            except OSError as e:
+                print(f"Could not write snapshot {snapshot_path}: {e}")
+
+        return {'features': features, 'neighbor_index': neighbor_index}
+
+    def _similarity_state(self):
+        """Scaled features and neighbor index, or None when similar food lookups are unavailable"""
+        try:
+            return self._similarity.get()
+        except ArtifactUnavailableError:
+            return None
+
+    @property
+    def features(self):
+        similarity = self._similarity_state()
+        return similarity['features'] if similarity is not None else None
+
+    @property
+    def neighbor_index(self):
+        similarity = self._similarity_state()
+        return similarity['neighbor_index'] if similarity is not None else None
+
+    def _index_store(self):
+        """Derive the scoring arrays and constraint index from the current store"""
+        # Contiguous nutrient arrays used to score candidates
+        self.nutrients = {
+            column: np.ascontiguousarray(self.store.columns[column], dtype=float)
+            for column in ['calories'] + MACRO_COLUMNS
+        }
+
+        # Index the constraint columns once so filtering is bitwise operations
+        self.constraint_index = ConstraintIndex(self.store, self.allergen_vocabulary, self.allergen_matrix)
+
+        # Cached rows refer to positions in the previous store
+        self.filter_cache.invalidate()
+
+        self._store_generation += 1
+        self.store_version = f"{self._data_stamp}.{self._store_generation}"
+
+        # Encodes responses holding FoodRecords of this store straight to JSON
+        self.response_encoder = ResponseEncoder(self.store)
+
+        # Seasonal recommendations are answered from tables ranked once per season
+        self.seasonal_ranking = self._build_seasonal_ranking(self.determine_current_season())
+
+    def _build_seasonal_ranking(self, season):
+        return SeasonalRanking(self.store, self.constraint_index, self.nutrients, season)
+
+    @property
+    def plan_store(self):
+        if self._plan_store is None:
+            self._plan_store = PlanStore(self.plan_store_dir)
+        return self._plan_store
+
+    @property
+    def encoder(self):
+        return self.artifacts['encoder'].get()
+
+    @property
+    def scaler(self):
+        return self.artifacts['scaler'].get()
 
-    def _compute_similarity_matrix(self):
-        """Compute similarity matrix based on nutritional values"""
-        from sklearn.metrics.pairwise import cosine_similarity
+    @property
+    def kmeans(self):
+        return self.artifacts['kmeans'].get()
 
+    def artifact_status(self):
+        """Availability, load time and errors of every model artifact"""
+        status = {name: artifact.status() for name, artifact in self.artifacts.items()}
+        for meal_type in self.meal_predictors:
+            status[f"{meal_type}_predictor"] = self.meal_predictors.artifact(meal_type).status()
+        return status
+
+    def load_artifacts(self):
+        """
+        Load every model artifact now instead of on first use.
+
+        Called before forking server workers so they share the loaded models. Artifacts
+        that are missing or fail to load are skipped and show up in artifact_status().
+        """
+        artifacts = list(self.artifacts.values())
+        artifacts.extend(self.meal_predictors.artifact(meal_type) for meal_type in self.meal_predictors)
+
+        for artifact in artifacts:
+            if artifact.available:
+                try:
+                    artifact.get()
+                except ArtifactUnavailableError:
+                    pass
+
+        # The neighbor index is built from the scaler's features if its file is missing
+        self._similarity_state()
+
+        return self.artifact_status()
+
+    @staticmethod
+    def _open_snapshot(food_data_path, models_dir, snapshot_path):
+        """Open the snapshot if it exists and was built from the current CSV and models"""
+        try:
+            return Snapshot(snapshot_path, sources=(food_data_path, models_dir))
+        except FileNotFoundError:
+            return None
+        except (StaleSnapshotError, ValueError) as e:
+            print(f"Ignoring snapshot: {e}")
+            return None
+
+    def _build_allergen_matrix(self):
+        """Parse the stringified allergen lists once into a (food x allergen) matrix"""
+        if not self.store.has_column('allergens'):
+            return [], np.zeros((len(self.store), 0), dtype=bool)
+
+        # The column only has a few distinct strings, so parse those and expand by code
+        vocabulary, category_matrix = build_allergen_matrix(self.store.categories['allergens'])
+        return vocabulary, category_matrix[self.store.columns['allergens']]
+
+    def _scaled_features(self):
+        """Scale the nutritional features the same way as during training"""
         # Get features that were used for scaling
         scaler_features = self.scaler.feature_names_in_
 
-        # Check which of those features are in our dataframe
-        valid_cols = [col for col in scaler_features if col in self.food_df.columns]
-        missing_cols = [col for col in scaler_features if col not in self.food_df.columns]
+        # Create a dataframe with all the necessary columns in the same order as during
+        # training, using default values (0) for any column the database lacks
+        features_df = pd.DataFrame({
+            col: self.store.columns[col] if self.store.has_column(col) else np.zeros(len(self.store))
+            for col in scaler_features
+        })
 
-        if missing_cols:
-            # Add missing columns with default values (0)
-            for col in missing_cols:
-                self.food_df[col] = 0
+        return self.scaler.transform(features_df)
+
+    def ingest_foods(self, foods, n_jobs=-1):
+        """
+        Add foods from a new source to the in-memory database.
 
-        # Create a dataframe with all the necessary columns in the same order as during training
-        features_df = self.food_df[scaler_features].copy()
+        Missing suitable_* flags are predicted by the meal type predictors, each in a
+        single batched predict_proba pass over the new foods. The predicted flags are
+        written into the store and the probabilities kept as suitability_* columns, so
+        filtering can rank candidates by confidence without running any model.
 
-        # Scale the features
-        features = self.scaler.transform(features_df)
+        Parameters:
+        -----------
+        foods : pandas.DataFrame
+            Foods in the food database schema; suitable_* columns may be missing or
+            contain blanks, and foods without a food_id get new ids. Blanks for a meal
+            type whose predictor is unavailable raise ValueError
+        n_jobs : int
+            Parallel jobs for each predictor, -1 uses all cores
+
+        Returns:
+        --------
+        pandas.DataFrame
+            The ingested foods with their flags filled in
+        """
+        next_food_id = int(self.store.columns['food_id'].max()) + 1 if len(self.store) else 1
+        foods = prepare_import(foods, self.store.column_names, next_food_id)
+
+        probabilities = predict_meal_suitability(foods, self.encoder, self.scaler, self.meal_predictors, n_jobs)
+        foods, confidence = fill_suitability_flags(foods, probabilities)
+
+        previous = self.store
+        self.store = previous.append(foods)
+        for meal_type in MEAL_TYPES:
+            column = f'suitability_{meal_type}'
+            self.store.add_column(column, np.concatenate([previous.columns[column], confidence[meal_type]]))
+
+        self.allergen_vocabulary, self.allergen_matrix = self._build_allergen_matrix()
+        self._index_store()
+
+        # Only the new foods need scaling and neighbor search; if the index was not built
+        # yet, building it on first use covers them anyway
+        similarity = self._similarity_state() if self._similarity.loaded else None
+        if similarity is not None:
+            new_features = self.scaler.transform(
+                pd.DataFrame({col: foods[col] for col in self.scaler.feature_names_in_})
+            )
+            similarity['features'] = np.vstack([similarity['features'], new_features])
+            similarity['neighbor_index'].add(new_features)
 
-        # Compute cosine similarity
-        similarity = cosine_similarity(features)
+        return foods
 
-        return similarity
+    @property
+    def food_df(self):
+        """The food database as a DataFrame, materialized from the store on every access"""
+        return self.store.to_frame()
 
     def calculate_bmr(self, age, sex, weight_kg, height_cm, activity_level):
         """Calculate Basal Metabolic Rate using the Mifflin-St Jeor Equation"""
@@ -84,15 +365,7 @@ class DietRecommendationApp:
             bmr = 10 * weight_kg + 6.25 * height_cm - 5 * age - 161
 
         # Apply activity factor
-        activity_factors = {
-            'sedentary': 1.2,      # Little or no exercise
-            'light': 1.375,        # Light exercise 1-3 days/week
-            'moderate': 1.55,      # Moderate exercise 3-5 days/week
-            'active': 1.725,       # Hard exercise 6-7 days/week
-            'very_active': 1.9     # Very hard exercise & physical job or 2x training
-        }
-
-        factor = activity_factors.get(activity_level.lower(), 1.2)
+        factor = ACTIVITY_FACTORS.get(activity_level.lower(), 1.2)
         tdee = bmr * factor
 
         return {
@@ -150,155 +423,63 @@ class DietRecommendationApp:
             'carbs_g': round(carb_target)
         }
 
-    def filter_foods_by_constraints(self, diet_type, meal_type, season, cuisines=None, allergens=None):
-        """Filter foods based on user constraints with error handling and fallbacks"""
-        # Start with all foods
-        filtered_df = self.food_df.copy()
-
-        # Filter by diet type if specified
-        if diet_type:
-            diet_mask = filtered_df['diet_type'] == diet_type
-            if diet_mask.sum() > 0:
-                filtered_df = filtered_df[diet_mask]
-            else:
-                # Try case-insensitive match
-                diet_mask = filtered_df['diet_type'].str.lower() == diet_type.lower()
-                if diet_mask.sum() > 0:
-                    filtered_df = filtered_df[diet_mask]
-
-        # Filter by meal type if specified
-        if meal_type:
-            column = f'suitable_{meal_type.lower()}'
-            if column in filtered_df.columns:
-                meal_mask = filtered_df[column] == 1
-                if meal_mask.sum() > 0:
-                    filtered_df = filtered_df[meal_mask]
-
-        # Filter by season if specified
-        if season and season in filtered_df.columns:
-            season_mask = filtered_df[season] == 1
-            if season_mask.sum() > 0:
-                filtered_df = filtered_df[season_mask]
-
-        # Filter by cuisine type if specified
-        if cuisines and len(cuisines) > 0 and 'cuisine_type' in filtered_df.columns:
-            cuisine_mask = filtered_df['cuisine_type'].isin(cuisines)
-            if cuisine_mask.sum() > 0:
-                filtered_df = filtered_df[cuisine_mask]
-
-        # Filter by allergens if specified
-        if allergens and len(allergens) > 0 and 'allergens' in filtered_df.columns:
-            for allergen in allergens:
-                if not allergen or allergen.strip() == '':
-                    continue
-
-                # Check if allergens column is string type
-                if filtered_df['allergens'].dtype == 'object':
-                    allergen_mask = filtered_df['allergens'].notna() & filtered_df['allergens'].str.contains(
-                        re.escape(allergen.strip()), case=False, na=False)
-                    filtered_df = filtered_df[~allergen_mask]
-
-        # If no foods remain after filtering, implement fallback strategy
-        if len(filtered_df) == 0:
-            # Fallback 1: Try without cuisine constraint
-            if cuisines and len(cuisines) > 0:
-                fallback_df = self.filter_foods_by_constraints(
-                    diet_type=diet_type,
-                    meal_type=meal_type,
-                    season=season,
-                    cuisines=None,
-                    allergens=allergens
-                )
-                if len(fallback_df) > 0:
-                    return fallback_df
-
-            # Fallback 2: Try without meal type constraint
-            if meal_type:
-                fallback_df = self.filter_foods_by_constraints(
-                    diet_type=diet_type,
-                    meal_type=None,
-                    season=season,
-                    cuisines=cuisines,
-                    allergens=allergens
-                )
-                if len(fallback_df) > 0:
-                    return fallback_df
-
-            # Fallback 3: Try without season constraint
-            if season:
-                fallback_df = self.filter_foods_by_constraints(
-                    diet_type=diet_type,
-                    meal_type=meal_type,
-                    season=None,
-                    cuisines=cuisines,
-                    allergens=allergens
-                )
-                if len(fallback_df) > 0:
-                    return fallback_df
-
-            # Fallback 4: Try with just diet type and allergens
-            if diet_type and allergens:
-                fallback_df = self.food_df.copy()
-
-                # Apply diet type filter
-                diet_mask = fallback_df['diet_type'] == diet_type
-                fallback_df = fallback_df[diet_mask]
-
-                # Apply allergen filter
-                if 'allergens' in fallback_df.columns:
-                    for allergen in allergens:
-                        if allergen.strip() == '':
-                            continue
-                        allergen_mask = fallback_df['allergens'].notna() & fallback_df['allergens'].str.contains(
-                            re.escape(allergen), case=False, na=False)
-                        fallback_df = fallback_df[~allergen_mask]
-
-                if len(fallback_df) > 0:
-                    return fallback_df
-
-            # Final fallback: Return any foods that don't contain allergens
-            fallback_df = self.food_df.copy()
-
-            if allergens and 'allergens' in fallback_df.columns:
-                for allergen in allergens:
-                    if allergen.strip() == '':
-                        continue
-                    allergen_mask = fallback_df['allergens'].notna() & fallback_df['allergens'].str.contains(
-                        re.escape(allergen), case=False, na=False)
-                    fallback_df = fallback_df[~allergen_mask]
-
-            if len(fallback_df) > 0:
-                return fallback_df.head(10)  # Return at least some options
-
-            # If all else fails, return the first 10 items from the original database
-            return self.food_df.sample(min(10, len(self.food_df)))
+    def filter_foods_by_constraints(self, diet_type, meal_type, season, cuisines=None, allergens=None,
+                                    rank_by_suitability=False):
+        """
+        Filter foods based on user constraints with error handling and fallbacks.
 
-        return filtered_df
+        With rank_by_suitability and a meal_type, the foods are ordered by their
+        suitability confidence for that meal, most confident first, and the
+        confidence is returned as a suitability_<meal_type> column. The constraints
+        that had to be relaxed are listed in the frame's attrs['relaxed_constraints'].
+        """
+        result = self._filter(diet_type, meal_type, season, cuisines, allergens)
+        rows = result.rows
+
+        confidence = None
+        if rank_by_suitability and meal_type and self.store.has_column(f'suitability_{meal_type}'):
+            confidence = self.store.columns[f'suitability_{meal_type}'][rows]
+            order = np.argsort(-confidence, kind='stable')
+            rows, confidence = rows[order], confidence[order]
+
+        # Only materialize the rows that survived filtering
+        foods = self.store.to_frame(rows)
+        if confidence is not None:
+            foods[f'suitability_{meal_type}'] = confidence
+        foods.attrs['relaxed_constraints'] = list(result.relaxed)
+        return foods
+
+    def _filter(self, diet_type, meal_type, season, cuisines=None, allergens=None):
+        """Resolve user constraints to a FilterResult, reusing cached results"""
+        key = filter_key(diet_type, meal_type, season, cuisines, allergens)
+        result = self.filter_cache.get(key)
+        if result is None:
+            result = resolve(self.constraint_index, diet_type, meal_type, season, cuisines, allergens)
+            result.rows.flags.writeable = False
+            self.filter_cache.put(key, result)
+        return result
 
     def get_similar_foods(self, food_id, top_n=5):
-        """Find similar foods based on similarity matrix"""
+        """Find similar foods using the precomputed neighbor index"""
         # Get index of the food
-        food_indices = self.food_df.index[self.food_df['food_id'] == food_id].tolist()
+        food_indices = self.store.find('food_id', food_id)
 
-        if not food_indices:
+        if len(food_indices) == 0 or self.neighbor_index is None:
             return []
 
         idx = food_indices[0]
 
-        # Get similarity scores
-        similarity_scores = list(enumerate(self.similarity_matrix[idx]))
-
-        # Sort by similarity (exclude itself)
-        similarity_scores = sorted(similarity_scores, key=lambda x: x[1], reverse=True)[1:top_n+1]
+        # Neighbors are stored best first and never include the food itself
+        neighbor_rows, neighbor_scores = self.neighbor_index.query(idx, top_n)
 
         # Get food details
         similar_foods = []
-        for i, score in similarity_scores:
-            food = self.food_df.iloc[i]
+        for i, score in zip(neighbor_rows, neighbor_scores):
+            food = self.store.record(i)
             similar_foods.append({
                 'food_id': food['food_id'],
                 'food_name': food['food_name'],
-                'similarity': score,
+                'similarity': float(score),
                 'calories': food['calories'],
                 'protein_g': food['protein_g'],
                 'diet_type': food['diet_type']
@@ -321,8 +502,15 @@ class DietRecommendationApp:
         else:
             return 'winter'
 
-    def recommend_daily_meals(self, user_profile):
-        """Generate complete meal recommendations for a day"""
+    def recommend_daily_meals(self, user_profile, ranking='calorie', top_n=3):
+        """
+        Generate complete meal recommendations for a day.
+
+        Options are ranked by one of the scores in selection.SCORERS ('calorie',
+        'macro', 'combined') or a custom scoring function.
+        """
+        scorer = get_scorer(ranking)
+
         # Calculate targets
         targets = self.get_user_calorie_targets(user_profile)
 
@@ -331,14 +519,6 @@ class DietRecommendationApp:
         if not season:
             season = self.determine_current_season()
 
-        # Meal distribution (percentage of daily calories)
-        meal_distribution = {
-            'breakfast': 0.25,
-            'lunch': 0.35,
-            'dinner': 0.30,
-            'snack': 0.10
-        }
-
         allergens = user_profile.get('allergies', [])
         diet_type = user_profile.get('diet_type', None)
         cuisines = user_profile.get('cuisines', {})
@@ -346,35 +526,40 @@ class DietRecommendationApp:
         daily_meals = {}
 
         # Generate recommendations for each meal
-        for meal, percentage in meal_distribution.items():
+        for meal, percentage in MEAL_DISTRIBUTION.items():
             meal_calories = targets['daily_calories'] * percentage
 
             # Get cuisines specific to this meal if available
             meal_cuisines = cuisines.get(meal, None)
 
             # Filter suitable foods
-            suitable_foods = self.filter_foods_by_constraints(
+            result = self._filter(
                 diet_type=diet_type,
                 meal_type=meal,
                 season=season,
                 cuisines=meal_cuisines,
                 allergens=allergens
             )
+            rows = result.rows
 
-            if len(suitable_foods) == 0:
+            if len(rows) == 0:
                 daily_meals[meal] = {"error": f"No suitable {meal} options found with your constraints"}
                 continue
 
-            # Sort by how close they are to the target calories
-            suitable_foods['calorie_diff'] = abs(suitable_foods['calories'] - meal_calories)
-            suitable_foods = suitable_foods.sort_values('calorie_diff')
+            # Score the candidates against this meal's targets and keep the best few
+            candidates = {column: values[rows] for column, values in self.nutrients.items()}
+            scores = scorer(candidates, self._meal_targets(targets, percentage))
+            top = top_k(scores, top_n)
 
-            # Take top 3 options
-            top_options = suitable_foods.head(3).to_dict('records')
+            top_options = [
+                self.store.record(row, {'calorie_diff': float(abs(calories - meal_calories))})
+                for row, calories in zip(rows[top], candidates['calories'][top])
+            ]
 
             daily_meals[meal] = {
                 'target_calories': round(meal_calories),
-                'options': top_options
+                'options': top_options,
+                'relaxed_constraints': list(result.relaxed)
             }
 
         return {
@@ -383,38 +568,188 @@ class DietRecommendationApp:
             'meals': daily_meals
         }
     
+    @staticmethod
+    def _meal_targets(targets, percentage):
+        """Share of the daily calorie and macro targets that falls on one meal"""
+        return {
+            'calories': targets['daily_calories'] * percentage,
+            'protein_g': targets['protein_g'] * percentage,
+            'fat_g': targets['fat_g'] * percentage,
+            'carbs_g': targets['carbs_g'] * percentage
+        }
+
+    def get_user_calorie_targets_batch(self, user_profiles):
+        """Calculate calorie and macronutrient targets for many profiles at once as NumPy arrays"""
+        age = np.array([p['age'] for p in user_profiles], dtype=float)
+        weight_kg = np.array([p['weight_kg'] for p in user_profiles], dtype=float)
+        height_cm = np.array([p['height_cm'] for p in user_profiles], dtype=float)
+        is_male = np.array([p['sex'].lower() == 'male' for p in user_profiles])
+        factor = np.array([ACTIVITY_FACTORS.get(p['activity_level'].lower(), 1.2) for p in user_profiles])
+        goal = np.array([p['goal'] for p in user_profiles], dtype=object)
+
+        # Mifflin-St Jeor Equation, same as calculate_bmr
+        bmr = 10 * weight_kg + 6.25 * height_cm - 5 * age + np.where(is_male, 5, -161)
+        tdee = bmr * factor
+
+        # Set targets based on goal
+        calorie_target = np.where(goal == 'lose_weight', np.round(tdee * 0.8),
+                                  np.where(goal == 'gain_weight', np.round(tdee * 1.15), np.round(tdee)))
+
+        # Calculate macronutrient targets
+        protein_target = weight_kg * 1.6
+        fat_target = (calorie_target * 0.25) / 9
+        carb_target = (calorie_target - (protein_target * 4 + fat_target * 9)) / 4
+
+        return {
+            'bmr': np.round(bmr).astype(int),
+            'tdee': np.round(tdee).astype(int),
+            'daily_calories': calorie_target.astype(int),
+            'protein_g': np.round(protein_target).astype(int),
+            'fat_g': np.round(fat_target).astype(int),
+            'carbs_g': np.round(carb_target).astype(int)
+        }
+
+    def recommend_daily_meals_batch(self, user_profiles, ranking='calorie', top_n=3):
+        """
+        Generate daily meal recommendations for many user profiles in one call.
+
+        Profiles that share the same constraints for a meal are filtered once, and the
+        closest options to each profile's calorie target are selected for the whole
+        group with a single vectorized distance computation.
+
+        Parameters:
+        -----------
+        user_profiles : list of dict
+            User profiles in the same format as recommend_daily_meals
+        ranking : str or callable
+            Score used to rank options, see recommend_daily_meals
+        top_n : int
+            Number of options to return per meal
+
+        Returns:
+        --------
+        list of dict
+            One meal plan per profile, in the same order and format as recommend_daily_meals
+        """
+        if not user_profiles:
+            return []
+
+        scorer = get_scorer(ranking)
+        targets = self.get_user_calorie_targets_batch(user_profiles)
+        current_season = self.determine_current_season()
+        seasons = [p.get('season') or current_season for p in user_profiles]
+
+        daily_meals = [{} for _ in user_profiles]
+
+        for meal, percentage in MEAL_DISTRIBUTION.items():
+            meal_calories = targets['daily_calories'] * percentage
+
+            # Group profiles by identical constraints so each distinct filter runs once
+            groups = {}
+            for i, profile in enumerate(user_profiles):
+                meal_cuisines = profile.get('cuisines', {}).get(meal, None)
+                key = (
+                    profile.get('diet_type', None),
+                    seasons[i],
+                    tuple(meal_cuisines) if meal_cuisines else None,
+                    tuple(profile.get('allergies', []) or [])
+                )
+                groups.setdefault(key, []).append(i)
+
+            for (diet_type, season, cuisines, allergens), members in groups.items():
+                result = self._filter(
+                    diet_type=diet_type,
+                    meal_type=meal,
+                    season=season,
+                    cuisines=list(cuisines) if cuisines else None,
+                    allergens=list(allergens)
+                )
+                rows = result.rows
+
+                if len(rows) == 0:
+                    for i in members:
+                        daily_meals[i][meal] = {"error": f"No suitable {meal} options found with your constraints"}
+                    continue
+
+                # (profiles x candidates) score of every candidate against every target
+                candidates = {column: values[rows] for column, values in self.nutrients.items()}
+                group_targets = {
+                    column: values[members, np.newaxis]
+                    for column, values in self._meal_targets(targets, percentage).items()
+                }
+                scores = scorer(candidates, group_targets)
+                top = top_k_rows(scores, top_n)
+                top_diff = np.abs(candidates['calories'][top] - group_targets['calories'])
+
+                for member, i in enumerate(members):
+                    options = [
+                        self.store.record(rows[position], {'calorie_diff': float(diff)})
+                        for position, diff in zip(top[member], top_diff[member])
+                    ]
+
+                    daily_meals[i][meal] = {
+                        'target_calories': round(meal_calories[i]),
+                        'options': options,
+                        'relaxed_constraints': list(result.relaxed)
+                    }
+
+        plans = []
+        for i in range(len(user_profiles)):
+            plans.append({
+                'daily_targets': {name: int(values[i]) for name, values in targets.items()},
+                'current_season': seasons[i],
+                'meals': daily_meals[i]
+            })
+
+        return plans
+
     def get_seasonal_recommendations(self, diet_type=None, meal_type=None, cuisines=None):
         """Get food recommendations for the current season"""
         season = self.determine_current_season()
-        
-        filtered_foods = self.filter_foods_by_constraints(
-            diet_type=diet_type,
-            meal_type=meal_type,
-            season=season,
-            cuisines=cuisines
-        )
-        
-        # Sort by nutritional value (protein to calorie ratio as an example)
-        if 'protein_g' in filtered_foods.columns and 'calories' in filtered_foods.columns:
-            filtered_foods['protein_ratio'] = filtered_foods['protein_g'] / filtered_foods['calories'].replace(0, 1)
-            filtered_foods = filtered_foods.sort_values('protein_ratio', ascending=False)
-        
+
+        # Rebuild the rankings once a new season has started
+        ranking = self.seasonal_ranking
+        if ranking.season != season:
+            ranking = self.seasonal_ranking = self._build_seasonal_ranking(season)
+
+        # Ranked by nutritional value (protein to calorie ratio as an example)
+        rows, relaxed = ranking.recommend(diet_type, meal_type, cuisines)
+
         return {
             'season': season,
-            'foods': filtered_foods.head(10).to_dict('records')
+            'foods': [
+                self.store.record(row, {'protein_ratio': float(ranking.protein_ratio[row])})
+                for row in rows
+            ],
+            'relaxed_constraints': list(relaxed)
         }
 
-    def save_meal_plan(self, meal_plan, filename=None):
-        """Save a meal plan to a JSON file"""
-        if filename is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"meal_plan_{timestamp}.json"
+    def save_meal_plan(self, meal_plan, filename=None, user_id=DEFAULT_USER_ID, plan_date=None):
+        """
+        Save a meal plan to the plan store, or export it to a JSON file.
 
-        # Convert to serializable format
-        serializable_plan = self._make_serializable(meal_plan)
+        Parameters:
+        -----------
+        meal_plan : dict
+            Plan from recommend_daily_meals
+        filename : str
+            Write the plan to this file instead of the store
+        user_id : str
+            User the plan belongs to
+        plan_date : str, date or datetime
+            Day the plan is for, today by default
+
+        Returns:
+        --------
+        int or str
+            Id of the stored plan, or the file name when exporting
+        """
+        body = self.response_encoder.encode(meal_plan)
+        if filename is None:
+            return self.plan_store.append(user_id, body, plan_date)
 
-        with open(filename, 'w') as f:
-            json.dump(serializable_plan, f, indent=2)
+        with open(filename, 'wb') as f:
+            f.write(body)
 
         return filename
 
@@ -422,6 +757,8 @@ class DietRecommendationApp:
         """Convert numpy types to Python native types for JSON serialization"""
         if isinstance(obj, dict):
             return {key: self._make_serializable(value) for key, value in obj.items()}
+        elif isinstance(obj, FoodRecord):
+            return obj.to_dict()
         elif isinstance(obj, list):
             return [self._make_serializable(item) for item in obj]
         elif isinstance(obj, np.integer):
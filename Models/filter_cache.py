@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+
+# Default number of distinct constraint combinations kept
+DEFAULT_MAXSIZE = 1024
+
+
+def filter_key(diet_type, meal_type, season, cuisines=None, allergens=None):
+    """
+    Canonical cache key of a set of filter constraints.
+
+    Cuisines and allergens are matched as sets, so their order and duplicates do not
+    matter, and an empty list means the same as no constraint.
+    """
+    return (
+        diet_type or None,
+        meal_type or None,
+        season or None,
+        tuple(sorted(set(cuisines))) if cuisines else (),
+        tuple(sorted(set(allergens))) if allergens else ()
+    )
+
+
+class FilterCache:
+    """
+    Bounded LRU cache of filter results.
+
+    Cached results are handed to every caller without copying, so callers must not
+    modify them. The cache is thread-safe and counts hits, misses, evictions and
+    invalidations.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Cached result for a key, or None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Cache a result, evicting the least recently used entry when full"""
+        if self.maxsize <= 0:
+            return value
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def invalidate(self):
+        """Drop every entry, e.g. after the food store changed"""
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Counters for health checks"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
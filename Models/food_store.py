@@ -0,0 +1,220 @@
+import numpy as np
+import pandas as pd
+
+# Low-cardinality text columns stored as integer codes with a lookup table
+CATEGORICAL_COLUMNS = ['cuisine_type', 'region', 'country', 'diet_type', 'meal_type', 'allergens']
+
+# 0/1 flag columns stored as uint8
+FLAG_COLUMNS = [
+    'suitable_breakfast', 'suitable_lunch', 'suitable_dinner', 'suitable_snack',
+    'spring', 'summer', 'fall', 'winter'
+]
+
+
+class FoodRecord:
+    """
+    Lightweight read-only view of one row of a FoodStore.
+
+    Behaves like the dict that DataFrame.to_dict('records') used to produce, but only
+    holds a reference to the store and a row position. Per-request values such as
+    calorie_diff live in a small extra dict next to the view.
+    """
+
+    __slots__ = ('_store', '_row', '_extra')
+
+    def __init__(self, store, row, extra=None):
+        self._store = store
+        self._row = row
+        self._extra = extra
+
+    def __getitem__(self, key):
+        if self._extra and key in self._extra:
+            return self._extra[key]
+        if key not in self._store.columns:
+            raise KeyError(key)
+        return self._store.value(self._row, key)
+
+    def __setitem__(self, key, value):
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __contains__(self, key):
+        return key in self._store.columns or bool(self._extra and key in self._extra)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __repr__(self):
+        return f"FoodRecord({self.to_dict()!r})"
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        names = list(self._store.column_names)
+        if self._extra:
+            names.extend(key for key in self._extra if key not in self._store.columns)
+        return names
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    @property
+    def row(self):
+        """Position of the food in the store"""
+        return self._row
+
+    @property
+    def store(self):
+        """FoodStore the food belongs to"""
+        return self._store
+
+    @property
+    def extra(self):
+        """Per-request values kept next to the row, or None"""
+        return self._extra
+
+    def to_dict(self):
+        """Plain dict of native Python values, ready for JSON"""
+        record = self._store.row_dict(self._row)
+        if self._extra:
+            for key, value in self._extra.items():
+                record[key] = value.item() if isinstance(value, np.generic) else value
+        return record
+
+
+class FoodStore:
+    """
+    Columnar in-memory food database.
+
+    Every column is a typed NumPy array: nutrients as float64, identifiers and sizes as
+    integers, 0/1 flags as uint8, and categorical text columns as integer codes into a
+    lookup table. Rows are handed out as FoodRecord views instead of per-row dicts.
+    """
+
+    def __init__(self, columns, categories, column_names):
+        """
+        Parameters:
+        -----------
+        columns : dict of str -> numpy.ndarray
+            Column arrays, all of the same length; categorical columns hold codes
+        categories : dict of str -> numpy.ndarray
+            Lookup table of values for every categorical column
+        column_names : list of str
+            Column order, as in the source CSV
+        """
+        self.columns = columns
+        self.categories = categories
+        self.column_names = list(column_names)
+        self.n_rows = len(next(iter(columns.values()))) if columns else 0
+
+    @classmethod
+    def from_csv(cls, path):
+        """Load the food database CSV into a store"""
+        return cls.from_frame(pd.read_csv(path))
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build a store from a DataFrame with the food database schema"""
+        columns = {}
+        categories = {}
+
+        for name in df.columns:
+            series = df[name]
+
+            if name in CATEGORICAL_COLUMNS:
+                codes, values = pd.factorize(series.fillna(''), sort=True)
+                columns[name] = codes.astype(np.int32)
+                categories[name] = np.asarray(values, dtype=object)
+            elif name in FLAG_COLUMNS:
+                columns[name] = series.fillna(0).to_numpy(dtype=np.uint8)
+            elif pd.api.types.is_integer_dtype(series):
+                columns[name] = series.to_numpy(dtype=np.int64)
+            elif pd.api.types.is_numeric_dtype(series):
+                columns[name] = series.to_numpy(dtype=np.float64)
+            else:
+                columns[name] = series.to_numpy(dtype=object)
+
+        return cls(columns, categories, df.columns)
+
+    def append(self, df):
+        """New store with the rows of a DataFrame in the same schema appended"""
+        new_rows = df[self.column_names].copy()
+
+        # Keep numeric columns at the store's dtypes so ids stay integers; text columns,
+        # object or fixed-width from a snapshot, are left to from_frame
+        for name in self.column_names:
+            if name not in self.categories and self.columns[name].dtype.kind not in 'OU':
+                new_rows[name] = new_rows[name].astype(self.columns[name].dtype)
+
+        return FoodStore.from_frame(pd.concat([self.to_frame(), new_rows], ignore_index=True))
+
+    def add_column(self, name, values):
+        """
+        Attach a derived column, such as a predicted probability.
+
+        Derived columns can be read like any other column but are not part of
+        column_names, so records and to_frame() keep the database schema.
+        """
+        values = np.asarray(values)
+        if len(values) != self.n_rows:
+            raise ValueError(f"Column {name} has {len(values)} values, the store has {self.n_rows} rows")
+        self.columns[name] = values
+
+    def __len__(self):
+        return self.n_rows
+
+    def has_column(self, name):
+        return name in self.columns
+
+    def column(self, name):
+        """Values of a column, decoding categorical codes"""
+        if name in self.categories:
+            return self.categories[name][self.columns[name]]
+        return self.columns[name]
+
+    def value(self, row, name):
+        """Native Python value of one cell"""
+        if name in self.categories:
+            return self.categories[name][self.columns[name][row]]
+
+        value = self.columns[name][row]
+        return value.item() if isinstance(value, np.generic) else value
+
+    def row_dict(self, row):
+        """Plain dict of one row"""
+        return {name: self.value(row, name) for name in self.column_names}
+
+    def record(self, row, extra=None):
+        """FoodRecord view of one row"""
+        return FoodRecord(self, int(row), extra)
+
+    def records(self, rows):
+        """FoodRecord views of several rows"""
+        return [FoodRecord(self, int(row)) for row in rows]
+
+    def find(self, name, value):
+        """Positions of the rows whose column equals value"""
+        if name in self.categories:
+            codes = np.flatnonzero(self.categories[name] == value)
+            if len(codes) == 0:
+                return codes
+            return np.flatnonzero(np.isin(self.columns[name], codes))
+        return np.flatnonzero(self.columns[name] == value)
+
+    def to_frame(self, rows=None):
+        """Materialize some or all rows as a DataFrame"""
+        data = {}
+        for name in self.column_names:
+            values = self.column(name)
+            data[name] = values if rows is None else values[rows]
+
+        index = None if rows is None else pd.Index(rows)
+        return pd.DataFrame(data, columns=self.column_names, index=index)
@@ -0,0 +1,193 @@
+import argparse
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from artifacts import ArtifactUnavailableError
+
+MEAL_TYPES = ['breakfast', 'lunch', 'dinner', 'snack']
+
+# Probability above which a predicted meal suitability becomes a 1 flag
+SUITABILITY_THRESHOLD = 0.5
+
+# Prefix of the allergen flag features the notebook derived from the raw allergens text
+_ALLERGEN_FEATURE_PREFIX = 'contains_'
+
+
+def build_predictor_features(foods, encoder, scaler, feature_names):
+    """
+    Build the feature matrix the meal type predictors were trained on.
+
+    Mirrors process_features() in diet_recommendation_training.ipynb: one-hot encoded
+    categoricals, scaled nutrients, season flags, and contains_* flags that match
+    fragments of the raw allergens text case-insensitively.
+
+    Parameters:
+    -----------
+    foods : pandas.DataFrame
+        Foods with the food database schema
+    encoder, scaler : fitted OneHotEncoder and StandardScaler
+        The artifacts saved by the training notebook
+    feature_names : array-like
+        feature_names_in_ of the predictors, which fixes the column order
+
+    Returns:
+    --------
+    pandas.DataFrame
+        One row per food, columns in feature_names order
+    """
+    n_rows = len(foods)
+    columns = {}
+
+    categorical_cols = list(encoder.feature_names_in_)
+    encoded = encoder.transform(foods[categorical_cols].astype(str))
+    if hasattr(encoded, 'toarray'):
+        encoded = encoded.toarray()
+    for j, name in enumerate(encoder.get_feature_names_out(categorical_cols)):
+        columns[name] = encoded[:, j]
+
+    numerical_cols = list(scaler.feature_names_in_)
+    scaled = scaler.transform(foods[numerical_cols])
+    for j, name in enumerate(numerical_cols):
+        columns[name] = scaled[:, j]
+
+    allergen_text = foods['allergens'].fillna('').astype(str) if 'allergens' in foods.columns else None
+
+    features = {}
+    for name in feature_names:
+        if name in columns:
+            features[name] = columns[name]
+        elif name.startswith(_ALLERGEN_FEATURE_PREFIX) and allergen_text is not None:
+            fragment = name[len(_ALLERGEN_FEATURE_PREFIX):]
+            features[name] = allergen_text.str.contains(re.escape(fragment), case=False).to_numpy(dtype=int)
+        elif name in foods.columns:
+            features[name] = foods[name].fillna(0).to_numpy()
+        else:
+            features[name] = np.zeros(n_rows)
+
+    return pd.DataFrame(features, columns=list(feature_names), index=foods.index)
+
+
+def predict_meal_suitability(foods, encoder, scaler, meal_predictors, n_jobs=-1):
+    """
+    Predict meal suitability probabilities for a batch of foods.
+
+    The feature matrix is built once and every available predictor runs a single
+    predict_proba over it, parallelized across trees with n_jobs. The predictors are
+    shared with the serving code, so their own n_jobs is restored afterwards.
+
+    Returns:
+    --------
+    dict of str -> numpy.ndarray
+        Probability of being suitable per meal type, for the predictors that loaded
+    """
+    probabilities = {}
+    features = None
+
+    for meal_type in MEAL_TYPES:
+        try:
+            predictor = meal_predictors[meal_type]
+        except (KeyError, ArtifactUnavailableError) as e:
+            print(f"No {meal_type} suitability predictions: {e}")
+            continue
+
+        if features is None:
+            features = build_predictor_features(foods, encoder, scaler, predictor.feature_names_in_)
+
+        previous_n_jobs = predictor.n_jobs
+        predictor.n_jobs = n_jobs
+        try:
+            proba = predictor.predict_proba(features)
+        finally:
+            predictor.n_jobs = previous_n_jobs
+        positive = list(predictor.classes_).index(1) if 1 in predictor.classes_ else None
+        probabilities[meal_type] = proba[:, positive] if positive is not None else np.zeros(len(foods))
+
+    return probabilities
+
+
+def prepare_import(foods, column_names, next_food_id):
+    """Align imported foods to the database columns and assign ids to foods without one"""
+    foods = foods.reset_index(drop=True).copy()
+
+    for name in column_names:
+        if name not in foods.columns:
+            foods[name] = np.nan
+
+    if foods['food_id'].isna().any():
+        missing = foods['food_id'].isna()
+        foods.loc[missing, 'food_id'] = np.arange(next_food_id, next_food_id + missing.sum())
+    foods['food_id'] = foods['food_id'].astype(np.int64)
+
+    if 'allergens' in foods.columns:
+        foods['allergens'] = foods['allergens'].fillna('[]')
+
+    # Flags other than the meal suitability ones default to 0, nutrients to 0
+    for name in column_names:
+        if name.startswith('suitable_') or foods[name].dtype == object:
+            continue
+        foods[name] = foods[name].fillna(0)
+
+    return foods[list(column_names)]
+
+
+def fill_suitability_flags(foods, probabilities):
+    """
+    Fill missing suitable_* flags from predicted probabilities.
+
+    Returns the foods with every flag filled and the suitability confidence per meal
+    type: the predicted probability where a flag was filled in, and the given flag
+    itself where the source already had one. Missing flags that no predictor covers
+    raise ValueError rather than silently keeping the foods out of that meal.
+    """
+    uncovered = {
+        meal_type: int(foods[f'suitable_{meal_type}'].isna().sum())
+        for meal_type in MEAL_TYPES if meal_type not in probabilities
+    }
+    uncovered = {meal_type: count for meal_type, count in uncovered.items() if count}
+    if uncovered:
+        details = ', '.join(f"{count} foods without suitable_{meal_type}" for meal_type, count in uncovered.items())
+        raise ValueError(f"No predictor available to fill in {details}; give the flags or restore the predictors")
+
+    foods = foods.copy()
+    confidence = {}
+
+    for meal_type in MEAL_TYPES:
+        column = f'suitable_{meal_type}'
+        missing = foods[column].isna().to_numpy()
+        given = foods[column].fillna(0).to_numpy(dtype=np.float32)
+
+        if meal_type in probabilities:
+            proba = np.asarray(probabilities[meal_type], dtype=np.float32)
+            flags = np.where(missing, proba >= SUITABILITY_THRESHOLD, given)
+            confidence[meal_type] = np.where(missing, proba, given)
+        else:
+            flags = given
+            confidence[meal_type] = given
+
+        foods[column] = flags.astype(int)
+
+    return foods, confidence
+
+
+if __name__ == '__main__':
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(
+        description="Import foods into the food database, predicting missing meal suitability flags")
+    parser.add_argument('foods', help="CSV of foods to import, in the food database schema")
+    parser.add_argument('--food-data', default=os.path.join(here, 'seasonal_food_database.csv'))
+    parser.add_argument('--models-dir', default=here)
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    args = parser.parse_args()
+
+    from diet_recommendation_app import DietRecommendationApp
+
+    recommender = DietRecommendationApp(args.food_data, args.models_dir)
+    imported = recommender.ingest_foods(pd.read_csv(args.foods), n_jobs=args.n_jobs)
+
+    # Append to the database so the next start (and snapshot) picks the foods up
+    imported[recommender.store.column_names].to_csv(args.food_data, mode='a', header=False, index=False)
+    print(f"Imported {len(imported)} foods into {args.food_data}")
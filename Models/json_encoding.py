@@ -0,0 +1,204 @@
+import math
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii
+
+import numpy as np
+
+from food_store import FoodRecord
+
+# Encoded rows kept per store; responses draw their options from a small hot set
+ROW_CACHE_SIZE = 4096
+
+# Distinct field projections whose column lists are kept
+PROJECTION_CACHE_SIZE = 64
+
+# Key of the shared food table in compact responses
+FOOD_TABLE_KEY = 'food_table'
+
+
+def _encode_float(value):
+    # NaN and infinities are not valid JSON
+    value = float(value)
+    return repr(value) if math.isfinite(value) else 'null'
+
+
+def _encode_int(value):
+    return str(int(value))
+
+
+def _encode_bool(value):
+    return 'true' if value else 'false'
+
+
+class _Projection:
+    """Fields and compact-mode food table of one encode() call"""
+
+    __slots__ = ('fields', 'compact', 'rows')
+
+    def __init__(self, fields, compact):
+        self.fields = fields
+        self.compact = compact
+        # Rows referenced by the response, in order of first appearance
+        self.rows = {}
+
+
+class ResponseEncoder:
+    """
+    Encodes responses containing FoodRecords straight to JSON bytes.
+
+    Every column of the store gets its key pre-encoded and an encoder for its NumPy
+    dtype; categorical columns have each category encoded once, so a record is a
+    lookup per column instead of a dict of converted Python values. Encoded rows are
+    cached, and the rest of a response (dicts, lists, NumPy scalars and arrays) is
+    written in the same pass, without first converting it to plain Python objects.
+
+    Records can be projected onto a subset of their fields, and in compact mode they
+    are written as references by food_id into a table of the distinct foods, added to
+    the top-level object. The output is compact JSON with NaN and infinities as null.
+    Tied to one store; build a new encoder when the store is replaced.
+    """
+
+    def __init__(self, store, row_cache_size=ROW_CACHE_SIZE):
+        self.store = store
+        self._columns = []
+        for name in store.column_names:
+            key = encode_basestring_ascii(str(name)) + ':'
+            values = store.columns[name]
+            if name in store.categories:
+                table = [self._encode_value(value) for value in store.categories[name]]
+                self._columns.append((name, key, values, table.__getitem__))
+            else:
+                self._columns.append((name, key, values, self._scalar_encoder(values.dtype)))
+        self._food_ids = store.columns.get('food_id')
+        self._row_json = lru_cache(maxsize=row_cache_size)(self._build_row_json)
+        self._projected_columns = lru_cache(maxsize=PROJECTION_CACHE_SIZE)(self._build_projected_columns)
+
+    def _scalar_encoder(self, dtype):
+        if dtype.kind == 'f':
+            return _encode_float
+        if dtype.kind in 'iu':
+            return _encode_int
+        if dtype.kind == 'b':
+            return _encode_bool
+        return self._encode_value
+
+    def _build_projected_columns(self, fields):
+        wanted = set(fields)
+        return [column for column in self._columns if column[0] in wanted]
+
+    def _build_row_json(self, row, fields=None):
+        # The members only, so a record's extra values can be appended
+        columns = self._columns if fields is None else self._projected_columns(fields)
+        return ','.join(key + encode(values[row]) for _, key, values, encode in columns)
+
+    def encode(self, obj, fields=None, compact=False):
+        """
+        JSON bytes of a response.
+
+        Parameters:
+        -----------
+        obj : object
+            The response, a dict when compact
+        fields : iterable of str
+            Only write these fields of every food, store columns and per-request values
+            such as calorie_diff alike; None writes them all
+        compact : bool
+            Write foods as {"food_id": ..., <per-request values>} and add their fields
+            once each under FOOD_TABLE_KEY, keyed by food_id
+        """
+        if fields is not None:
+            fields = tuple(sorted(set(fields)))
+        projection = _Projection(fields, compact) if fields is not None or compact else None
+        if compact and (not isinstance(obj, dict) or self._food_ids is None):
+            raise TypeError("Compact encoding needs a dict response and a store with food_id")
+
+        parts = []
+        self._encode(obj, parts, projection)
+        if compact:
+            table = ','.join(
+                f'"{int(self._food_ids[row])}":{{{self._row_json(row, fields)}}}' for row in projection.rows
+            )
+            # Close the top-level object with the food table instead
+            closing = parts.pop()
+            parts.append(('{' if closing == '{}' else ',') + f'"{FOOD_TABLE_KEY}":{{{table}}}}}')
+        return ''.join(parts).encode('ascii')
+
+    def _encode_value(self, obj):
+        parts = []
+        self._encode(obj, parts, None)
+        return ''.join(parts)
+
+    def _encode(self, obj, parts, projection):
+        if isinstance(obj, str):
+            parts.append(encode_basestring_ascii(obj))
+        elif obj is None:
+            parts.append('null')
+        elif obj is True or obj is False or isinstance(obj, np.bool_):
+            parts.append(_encode_bool(obj))
+        elif isinstance(obj, (float, np.floating)):
+            parts.append(_encode_float(obj))
+        elif isinstance(obj, (int, np.integer)):
+            parts.append(_encode_int(obj))
+        elif isinstance(obj, dict):
+            if not obj:
+                parts.append('{}')
+                return
+            separator = '{'
+            for key, value in obj.items():
+                parts.append(separator)
+                parts.append(self._encode_key(key))
+                self._encode(value, parts, projection)
+                separator = ','
+            parts.append('}')
+        elif isinstance(obj, FoodRecord):
+            self._encode_record(obj, parts, projection)
+        elif isinstance(obj, (list, tuple)):
+            if not obj:
+                parts.append('[]')
+                return
+            separator = '['
+            for item in obj:
+                parts.append(separator)
+                self._encode(item, parts, projection)
+                separator = ','
+            parts.append(']')
+        elif isinstance(obj, np.ndarray):
+            self._encode(obj.tolist(), parts, projection)
+        else:
+            raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    def _encode_key(self, key):
+        if isinstance(key, str):
+            return encode_basestring_ascii(key) + ':'
+        if isinstance(key, (bool, np.bool_)) or key is None:
+            return '"' + ('null' if key is None else _encode_bool(key)) + '":'
+        if isinstance(key, (float, np.floating)):
+            return '"' + _encode_float(key) + '":'
+        if isinstance(key, (int, np.integer)):
+            return '"' + _encode_int(key) + '":'
+        raise TypeError(f"Keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+    def _encode_record(self, record, parts, projection):
+        fields = projection.fields if projection is not None else None
+        extra = record.extra
+        if record.store is not self.store or (extra and any(key in self.store.columns for key in extra)):
+            # Records of another store, or extras overriding columns, take the slow path
+            values = record.to_dict()
+            if fields is not None:
+                values = {key: value for key, value in values.items() if key in fields}
+            self._encode(values, parts, None)
+            return
+
+        row = record.row
+        if projection is not None and projection.compact:
+            projection.rows[row] = None
+            members = [f'"food_id":{int(self._food_ids[row])}']
+        else:
+            members = [self._row_json(row, fields)]
+
+        if extra:
+            for key, value in extra.items():
+                if fields is None or key in fields:
+                    members.append(self._encode_key(key) + self._encode_value(value))
+
+        parts.append('{' + ','.join(member for member in members if member) + '}')
@@ -0,0 +1,174 @@
+import hashlib
+
+import numpy as np
+
+from selection import top_k_rows
+
+# Number of neighbors kept per food
+DEFAULT_K = 20
+
+# Rows compared against the whole database at once while building, bounds peak memory
+BLOCK_SIZE = 1024
+
+
+def features_hash(features):
+    """Content hash of a feature matrix, to tell whether an index was built from it"""
+    features = np.ascontiguousarray(features, dtype=np.float64)
+    digest = hashlib.sha256(repr(features.shape).encode())
+    digest.update(memoryview(features).cast('B'))
+    return digest.hexdigest()
+
+
+def _normalize(features):
+    """L2-normalize feature rows so dot products are cosine similarities"""
+    vectors = np.asarray(features, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    # Zero vectors have zero similarity to everything, as in sklearn's cosine_similarity
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def _top_k(scores, k):
+    """Column indices of the k largest scores per row, sorted best first"""
+    return top_k_rows(-scores, k)
+
+
+class NeighborIndex:
+    """
+    Top-K cosine-similarity neighbors for every food.
+
+    Only the K best neighbors per food are kept, as an (N x K) int32 array of row
+    positions and an (N x K) float32 array of similarities sorted best first. The
+    normalized feature vectors are kept as well so foods can be added incrementally
+    and queries for more than K neighbors can still be answered.
+
+    source_hash is the features_hash() of the features the index was built from, so
+    an index saved for other features, e.g. of a CSV edited in place, can be told apart.
+    """
+
+    def __init__(self, neighbors, scores, vectors, source_hash=None):
+        """
+        Parameters:
+        -----------
+        neighbors : numpy.ndarray
+            (N x K) int32 row positions of each food's neighbors, best first
+        scores : numpy.ndarray
+            (N x K) float32 cosine similarities matching neighbors
+        vectors : numpy.ndarray
+            (N x D) float32 L2-normalized feature vectors
+        source_hash : str
+            features_hash() of the (N x D) features the index covers, if known
+        """
+        self.neighbors = neighbors
+        self.scores = scores
+        self.vectors = vectors
+        self.source_hash = source_hash
+
+    @property
+    def n_rows(self):
+        return len(self.vectors)
+
+    @property
+    def k(self):
+        return self.neighbors.shape[1]
+
+    @classmethod
+    def build(cls, features, k=DEFAULT_K, block_size=BLOCK_SIZE):
+        """Build the index from an (N x D) feature matrix"""
+        vectors = _normalize(features)
+        n_rows = len(vectors)
+        k = min(k, max(n_rows - 1, 0))
+
+        neighbors = np.empty((n_rows, k), dtype=np.int32)
+        scores = np.empty((n_rows, k), dtype=np.float32)
+
+        for start in range(0, n_rows, block_size):
+            stop = min(start + block_size, n_rows)
+            block_scores = vectors[start:stop] @ vectors.T
+
+            # A food is never its own neighbor
+            block_scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+
+            top = _top_k(block_scores, k)
+            neighbors[start:stop] = top
+            scores[start:stop] = np.take_along_axis(block_scores, top, axis=1)
+
+        return cls(neighbors, scores, vectors, features_hash(features))
+
+    def add(self, features, block_size=BLOCK_SIZE, source_hash=None):
+        """
+        Add new foods to the index without rebuilding it.
+
+        The new foods get row positions after the existing ones. Their neighbor lists
+        are computed against every food, and existing foods only have their lists
+        updated where a new food beats one of their current neighbors. source_hash is
+        the features_hash() of all features, old and new, if known.
+        """
+        new_vectors = _normalize(features)
+        if len(new_vectors) == 0:
+            return
+
+        n_old = self.n_rows
+        vectors = np.vstack([self.vectors, new_vectors])
+        n_rows = len(vectors)
+        k = min(max(self.k, DEFAULT_K), n_rows - 1)
+        new_columns = np.arange(n_old, n_rows)
+
+        neighbors = np.empty((n_rows, k), dtype=np.int32)
+        scores = np.empty((n_rows, k), dtype=np.float32)
+
+        # Merge each existing food's neighbor list with its similarity to the new foods
+        for start in range(0, n_old, block_size):
+            stop = min(start + block_size, n_old)
+            new_scores = vectors[start:stop] @ new_vectors.T
+
+            merged_neighbors = np.hstack([
+                self.neighbors[start:stop],
+                np.broadcast_to(new_columns, new_scores.shape)
+            ])
+            merged_scores = np.hstack([self.scores[start:stop], new_scores])
+
+            top = _top_k(merged_scores, k)
+            neighbors[start:stop] = np.take_along_axis(merged_neighbors, top, axis=1)
+            scores[start:stop] = np.take_along_axis(merged_scores, top, axis=1)
+
+        # New foods are compared against the whole database
+        for start in range(n_old, n_rows, block_size):
+            stop = min(start + block_size, n_rows)
+            block_scores = vectors[start:stop] @ vectors.T
+            block_scores[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+
+            top = _top_k(block_scores, k)
+            neighbors[start:stop] = top
+            scores[start:stop] = np.take_along_axis(block_scores, top, axis=1)
+
+        self.neighbors, self.scores, self.vectors = neighbors, scores, vectors
+        self.source_hash = source_hash
+
+    def query(self, row, top_n=5):
+        """Row positions and similarities of the top_n neighbors of a food, best first"""
+        if top_n <= self.k:
+            return self.neighbors[row, :top_n], self.scores[row, :top_n]
+
+        # More neighbors than were precomputed, select them from the vectors directly
+        row_scores = self.vectors @ self.vectors[row]
+        row_scores[row] = -np.inf
+        top = _top_k(row_scores[np.newaxis, :], min(top_n, self.n_rows - 1))[0]
+        return top, row_scores[top]
+
+    def save(self, path):
+        """Persist the index as an .npz archive"""
+        with open(path, 'wb') as f:
+            np.savez(
+                f, neighbors=self.neighbors, scores=self.scores, vectors=self.vectors,
+                source_hash=np.array(self.source_hash or '')
+            )
+
+    @classmethod
+    def load(cls, path):
+        """Load an index written by save()"""
+        with np.load(path) as data:
+            # Indexes saved before source hashes were recorded have none
+            source_hash = str(data['source_hash']) if 'source_hash' in data.files else ''
+            return cls(data['neighbors'], data['scores'], data['vectors'], source_hash or None)
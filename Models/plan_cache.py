@@ -0,0 +1,52 @@
+import hashlib
+import json
+import os
+
+from filter_cache import FilterCache
+
+# Default number of distinct profiles whose plans are kept
+DEFAULT_MAXSIZE = int(os.environ.get('PLAN_CACHE_SIZE', 4096))
+
+
+def profile_fingerprint(user_profile, season, store_version, ranking='calorie', top_n=3, representation=''):
+    """
+    Canonical fingerprint of everything a daily meal plan depends on.
+
+    The profile is hashed as canonical JSON, so the order of its keys doesn't matter
+    while every value does: the plan echoes the profile back, so two profiles only
+    share a plan if they are identical. The representation (see
+    response_format.representation) tells apart projections of one plan, so the
+    fingerprint can double as the ETag of each.
+    """
+    canonical = json.dumps(
+        {
+            'profile': user_profile,
+            'season': season,
+            'store_version': store_version,
+            'ranking': ranking,
+            'top_n': top_n,
+            'representation': representation
+        },
+        sort_keys=True, separators=(',', ':'), default=str
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]
+
+
+class PlanCache(FilterCache):
+    """
+    Bounded LRU cache of serialized meal plans, keyed by profile fingerprint.
+
+    Fingerprints already include the food store version, so plans built from an old
+    store are never returned; sync() additionally drops them as soon as the version
+    changes instead of waiting for them to be evicted.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        super().__init__(maxsize)
+        self.store_version = None
+
+    def sync(self, store_version):
+        """Invalidate the cache if the food store changed since the last call"""
+        if store_version != self.store_version:
+            self.invalidate()
+            self.store_version = store_version
@@ -0,0 +1,455 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import date, datetime
+
+try:
+    import fcntl
+except ImportError:
+    # No cross-process locking without fcntl; a single process is still safe
+    fcntl = None
+
+PLAN_STORE_DIR = os.environ.get(
+    'PLAN_STORE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'meal_plans')
+)
+
+# Segment files are rotated once they grow past this many bytes, 64 MiB by default
+PLAN_SEGMENT_SIZE = int(os.environ.get('PLAN_SEGMENT_SIZE', 64 << 20))
+
+# zlib level of stored plans; they are written once and read rarely, so favour size
+PLAN_COMPRESSION_LEVEL = int(os.environ.get('PLAN_COMPRESSION_LEVEL', 9))
+
+INDEX_FILE = 'index.sqlite3'
+LOCK_FILE = 'store.lock'
+
+# Record layout: MAGIC, payload length (uint32), CRC-32 of the payload (uint32), then the
+# zlib-compressed JSON of the plan. The index points at whole records.
+MAGIC = b'MPL1'
+_HEADER = struct.Struct('<4sII')
+
+# Names of the files save_meal_plan used to write, e.g. meal_plan_20250421_143454.json
+_LEGACY_NAME = re.compile(r'meal_plan_(\d{8}_\d{6})\.json$')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    plan_date TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS plans_by_user_date ON plans (user_id, plan_date, created_at);
+CREATE INDEX IF NOT EXISTS plans_by_user_created ON plans (user_id, created_at);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY
+);
+INSERT INTO segments (id) SELECT 1 WHERE NOT EXISTS (SELECT 1 FROM segments);
+"""
+
+_COLUMNS = 'id, user_id, plan_date, created_at, segment, offset, length'
+
+
+class CorruptPlanError(Exception):
+    """Raised when a stored record does not match its index entry or checksum"""
+
+
+def _date_string(value):
+    if value is None:
+        return date.today().isoformat()
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    # Validates the string, so dates always compare correctly as text
+    return date.fromisoformat(str(value)).isoformat()
+
+
+class PlanStore:
+    """
+    Append-only store of meal plans, indexed by user and date.
+
+    Plans are compressed into records appended to segment files, and a SQLite index
+    maps (user, plan date, creation time) to the segment, offset and length of every
+    record. The latest plan of a user or the plans in a date range are an index lookup
+    and one read per plan, however many plans are stored. Records are never rewritten
+    in place; compact() copies the plans that are still wanted into fresh segments and
+    removes the old ones.
+
+    Appends and compaction take an exclusive file lock and reads a shared one, so the
+    store can be used by every worker process on the host.
+    """
+
+    def __init__(self, directory=PLAN_STORE_DIR, segment_size=PLAN_SEGMENT_SIZE, level=PLAN_COMPRESSION_LEVEL):
+        """
+        Parameters:
+        -----------
+        directory : str
+            Directory of the index and segment files, created if missing
+        segment_size : int
+            Size in bytes past which appends start a new segment
+        level : int
+            zlib compression level of new records
+        """
+        self.directory = directory
+        self.segment_size = segment_size
+        self.level = level
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._lock_file = open(os.path.join(directory, LOCK_FILE), 'a+b')
+        self._db = sqlite3.connect(os.path.join(directory, INDEX_FILE), check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        with self._locked(exclusive=True):
+            self._db.executescript(_SCHEMA)
+            self._db.commit()
+
+        # Segment that appends go to, and its open file
+        self._segment = None
+        self._segment_file = None
+
+    def segment_path(self, segment):
+        return os.path.join(self.directory, f"segment-{segment:06d}.log")
+
+    @contextmanager
+    def _locked(self, exclusive):
+        with self._lock:
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _active_segment(self):
+        """Open file of the newest segment, following rotations by other processes"""
+        segment = self._db.execute('SELECT MAX(id) FROM segments').fetchone()[0]
+        if segment != self._segment:
+            if self._segment_file is not None:
+                self._segment_file.close()
+            self._segment_file = open(self.segment_path(segment), 'ab')
+            self._segment = segment
+        return self._segment_file
+
+    def append(self, user_id, plan, plan_date=None, created_at=None):
+        """
+        Store a meal plan and return its id.
+
+        Parameters:
+        -----------
+        user_id : str
+            User the plan belongs to
+        plan : bytes or object
+            JSON bytes of the plan, or a JSON-serializable plan
+        plan_date : str, date or datetime
+            Day the plan is for, today by default
+        created_at : float
+            Unix time the plan was made, now by default
+        """
+        if not isinstance(plan, (bytes, bytearray)):
+            plan = json.dumps(plan, separators=(',', ':')).encode('utf-8')
+        payload = zlib.compress(plan, self.level)
+        record = _HEADER.pack(MAGIC, len(payload), zlib.crc32(payload)) + payload
+        plan_date = _date_string(plan_date)
+        created_at = time.time() if created_at is None else float(created_at)
+
+        with self._locked(exclusive=True):
+            f = self._active_segment()
+            # Other processes may have appended since this file was last written
+            offset = f.seek(0, os.SEEK_END)
+            f.write(record)
+            # The record is on disk before the index refers to it
+            f.flush()
+            os.fsync(f.fileno())
+
+            cursor = self._db.execute(
+                'INSERT INTO plans (user_id, plan_date, created_at, segment, offset, length) VALUES (?, ?, ?, ?, ?, ?)',
+                (str(user_id), plan_date, created_at, self._segment, offset, len(record))
+            )
+            if offset + len(record) >= self.segment_size:
+                self._db.execute('INSERT INTO segments (id) VALUES (?)', (self._segment + 1,))
+            self._db.commit()
+            return cursor.lastrowid
+
+    def get(self, plan_id, raw=False):
+        """A plan by id, see latest() for the entry returned, or None"""
+        return self._fetch_one(f'SELECT {_COLUMNS} FROM plans WHERE id = ?', (plan_id,), raw)
+
+    def latest(self, user_id, raw=False):
+        """
+        Most recently created plan of a user, or None.
+
+        The entry is a dict of the plan's id, user_id, plan_date, created_at and the
+        plan itself, decoded or, when raw is set, as JSON bytes.
+        """
+        return self._fetch_one(
+            f'SELECT {_COLUMNS} FROM plans WHERE user_id = ? ORDER BY created_at DESC, id DESC LIMIT 1',
+            (str(user_id),), raw
+        )
+
+    def history(self, user_id, start=None, end=None, limit=None, raw=False):
+        """
+        Plans of a user dated between start and end, both inclusive and optional.
+
+        Entries are ordered by plan date and creation time, see latest() for their
+        fields. With a limit only the first that many are returned.
+        """
+        query = f'SELECT {_COLUMNS} FROM plans WHERE user_id = ?'
+        params = [str(user_id)]
+        if start is not None:
+            query += ' AND plan_date >= ?'
+            params.append(_date_string(start))
+        if end is not None:
+            query += ' AND plan_date <= ?'
+            params.append(_date_string(end))
+        query += ' ORDER BY plan_date, created_at, id'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(int(limit))
+        return self._fetch(query, params, raw)
+
+    def _fetch_one(self, query, params, raw):
+        entries = self._fetch(query, params, raw)
+        return entries[0] if entries else None
+
+    def _fetch(self, query, params, raw):
+        with self._locked(exclusive=False):
+            rows = self._db.execute(query, params).fetchall()
+            entries = []
+            files = {}
+            try:
+                for plan_id, user_id, plan_date, created_at, segment, offset, length in rows:
+                    if segment not in files:
+                        files[segment] = open(self.segment_path(segment), 'rb')
+                    f = files[segment]
+                    f.seek(offset)
+                    plan = self._decode(f.read(length), plan_id, length)
+                    entries.append({
+                        'id': plan_id,
+                        'user_id': user_id,
+                        'plan_date': plan_date,
+                        'created_at': created_at,
+                        'plan': plan if raw else json.loads(plan)
+                    })
+            finally:
+                for f in files.values():
+                    f.close()
+        return entries
+
+    def _decode(self, record, plan_id, length):
+        if len(record) != length or len(record) < _HEADER.size:
+            raise CorruptPlanError(f"Plan {plan_id} is truncated")
+        magic, size, checksum = _HEADER.unpack_from(record)
+        payload = record[_HEADER.size:]
+        if magic != MAGIC or size != len(payload) or zlib.crc32(payload) != checksum:
+            raise CorruptPlanError(f"Plan {plan_id} does not match its checksum")
+        return zlib.decompress(payload)
+
+    def compact(self, keep_per_date=None, before=None):
+        """
+        Rewrite the store without plans that are no longer wanted.
+
+        The kept records are copied as they are into new segments, in order of user
+        and date so that a user's history is read sequentially, then the index is
+        switched over in one transaction and the old segments are deleted. Records
+        written by a process that crashed before indexing them are dropped too.
+
+        Parameters:
+        -----------
+        keep_per_date : int
+            Keep only the latest this many plans of every user and date
+        before : str, date or datetime
+            Drop plans dated before this day
+
+        Returns:
+        --------
+        dict
+            Plans kept and dropped, and the size of the segments before and after
+        """
+        conditions = []
+        params = []
+        if before is not None:
+            conditions.append('plan_date >= ?')
+            params.append(_date_string(before))
+        if keep_per_date is not None:
+            conditions.append('position <= ?')
+            params.append(int(keep_per_date))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+        with self._locked(exclusive=True):
+            old_segments = [row[0] for row in self._db.execute('SELECT id FROM segments ORDER BY id')]
+            size_before = self._segments_size(old_segments)
+            total = self._db.execute('SELECT COUNT(*) FROM plans').fetchone()[0]
+            kept = self._db.execute(
+                f"""
+                SELECT id, segment, offset, length FROM (
+                    SELECT id, user_id, plan_date, created_at, segment, offset, length,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY user_id, plan_date ORDER BY created_at DESC, id DESC
+                           ) AS position
+                    FROM plans
+                ) {where}
+                ORDER BY user_id, plan_date, created_at, id
+                """,
+                params
+            ).fetchall()
+
+            segment = old_segments[-1] + 1
+            new_segments = [segment]
+            moved = []
+            sources = {}
+            out = open(self.segment_path(segment), 'wb')
+            try:
+                for plan_id, source, offset, length in kept:
+                    if source not in sources:
+                        sources[source] = open(self.segment_path(source), 'rb')
+                    sources[source].seek(offset)
+                    record = sources[source].read(length)
+                    # Copying a damaged record would hide it, decoding checks it first
+                    self._decode(record, plan_id, length)
+
+                    if out.tell() and out.tell() + length > self.segment_size:
+                        out.flush()
+                        os.fsync(out.fileno())
+                        out.close()
+                        segment += 1
+                        new_segments.append(segment)
+                        out = open(self.segment_path(segment), 'wb')
+                    moved.append((segment, out.tell(), plan_id))
+                    out.write(record)
+                out.flush()
+                os.fsync(out.fileno())
+            finally:
+                out.close()
+                for f in sources.values():
+                    f.close()
+
+            with self._db:
+                self._db.execute('CREATE TEMP TABLE kept (id INTEGER PRIMARY KEY)')
+                self._db.executemany('INSERT INTO kept (id) VALUES (?)', [(plan_id,) for _, _, plan_id in moved])
+                self._db.execute('DELETE FROM plans WHERE id NOT IN (SELECT id FROM kept)')
+                self._db.execute('DROP TABLE kept')
+                self._db.executemany('UPDATE plans SET segment = ?, offset = ? WHERE id = ?', moved)
+                self._db.execute('DELETE FROM segments')
+                self._db.executemany('INSERT INTO segments (id) VALUES (?)', [(s,) for s in new_segments])
+
+            for old in old_segments:
+                try:
+                    os.remove(self.segment_path(old))
+                except FileNotFoundError:
+                    pass
+
+            return {
+                'kept': len(moved),
+                'dropped': total - len(moved),
+                'bytes_before': size_before,
+                'bytes_after': self._segments_size(new_segments),
+            }
+
+    def _segments_size(self, segments):
+        size = 0
+        for segment in segments:
+            try:
+                size += os.path.getsize(self.segment_path(segment))
+            except FileNotFoundError:
+                pass
+        return size
+
+    def stats(self):
+        """Counters for health checks"""
+        with self._locked(exclusive=False):
+            plans, users, live = self._db.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT user_id), COALESCE(SUM(length), 0) FROM plans'
+            ).fetchone()
+            segments = [row[0] for row in self._db.execute('SELECT id FROM segments')]
+            return {
+                'plans': plans,
+                'users': users,
+                'segments': len(segments),
+                'bytes': self._segments_size(segments),
+                'live_bytes': live,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._segment_file is not None:
+                self._segment_file.close()
+                self._segment_file = None
+                self._segment = None
+            self._db.close()
+            self._lock_file.close()
+
+
+def import_files(store, paths, user_id):
+    """
+    Append meal plans saved as JSON files, one per file, and return their ids.
+
+    Plans are dated by the timestamp in save_meal_plan's old file names, or by the
+    file's modification time for other names.
+    """
+    ids = []
+    for path in sorted(paths):
+        match = _LEGACY_NAME.search(os.path.basename(path))
+        if match:
+            created = datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+        else:
+            created = datetime.fromtimestamp(os.path.getmtime(path))
+        with open(path, 'rb') as f:
+            plan = json.load(f)
+        ids.append(store.append(user_id, plan, created, created.timestamp()))
+    return ids
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Maintain the meal plan store")
+    parser.add_argument('--dir', default=PLAN_STORE_DIR, help="Store directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help="Append plans saved as JSON files")
+    import_parser.add_argument('files', nargs='+', help="meal_plan_*.json files")
+    import_parser.add_argument('--user', required=True, help="User the plans belong to")
+
+    compact_parser = commands.add_parser('compact', help="Rewrite the segments without unwanted plans")
+    compact_parser.add_argument('--keep-per-date', type=int, help="Latest plans kept per user and date")
+    compact_parser.add_argument('--before', help="Drop plans dated before this day (YYYY-MM-DD)")
+
+    latest_parser = commands.add_parser('latest', help="Print the latest plan of a user")
+    latest_parser.add_argument('user')
+
+    history_parser = commands.add_parser('history', help="List the plans of a user")
+    history_parser.add_argument('user')
+    history_parser.add_argument('--start', help="First day (YYYY-MM-DD)")
+    history_parser.add_argument('--end', help="Last day (YYYY-MM-DD)")
+
+    commands.add_parser('stats', help="Print store counters")
+    args = parser.parse_args()
+
+    store = PlanStore(args.dir)
+    try:
+        if args.command == 'import':
+            ids = import_files(store, args.files, args.user)
+            print(f"Imported {len(ids)} plans for {args.user}")
+        elif args.command == 'compact':
+            start = time.perf_counter()
+            result = store.compact(args.keep_per_date, args.before)
+            print(f"Compacted in {time.perf_counter() - start:.2f}s: {result}")
+        elif args.command == 'latest':
+            entry = store.latest(args.user)
+            print(json.dumps(entry, indent=2) if entry else f"No plans for {args.user}")
+        elif args.command == 'history':
+            for entry in store.history(args.user, args.start, args.end):
+                calories = entry['plan'].get('daily_targets', {}).get('daily_calories')
+                created = datetime.fromtimestamp(entry['created_at']).isoformat(timespec='seconds')
+                print(f"{entry['id']}\t{entry['plan_date']}\t{created}\t{calories} kcal")
+        print(store.stats())
+    finally:
+        store.close()
@@ -0,0 +1,119 @@
+from collections import namedtuple
+
+import numpy as np
+
+# Soft constraints in the order they narrow the candidates
+CONSTRAINT_ORDER = ['diet_type', 'meal_type', 'season', 'cuisines']
+
+# Constraints dropped, cumulatively, when a constraint set leaves no foods
+RELAXATION_LADDER = ['cuisines', 'meal_type', 'season']
+
+# Foods returned by the last-resort fallbacks
+FALLBACK_SIZE = 10
+
+FilterResult = namedtuple('FilterResult', ['rows', 'relaxed'])
+FilterResult.__doc__ = """Row positions matching a constraint set, and the names of the constraints that had to be relaxed"""
+
+
+def resolve(index, diet_type, meal_type, season, cuisines=None, allergens=None):
+    """
+    Resolve user constraints to row positions, relaxing them when nothing matches.
+
+    Every constraint bitset is computed once and the fallback ladder only recombines
+    them, so a profile that needs every fallback costs a few extra bitwise operations
+    instead of a full re-filter per step.
+
+    A soft constraint that would leave no foods is skipped, and allergens are always
+    excluded. When that still leaves nothing, cuisines, then meal type, then season are
+    dropped in turn. After that come foods of the exact diet type without the
+    allergens, then the first foods without the allergens, and finally a random sample.
+
+    Parameters:
+    -----------
+    index : ConstraintIndex
+        Bitsets of the food store
+    diet_type, meal_type, season : str
+        Constraints, ignored when empty
+    cuisines, allergens : list of str
+        Constraints, ignored when empty
+
+    Returns:
+    --------
+    FilterResult
+        The rows and the relaxed constraints, in CONSTRAINT_ORDER followed by 'allergens'
+    """
+    masks = _masks(index, diet_type, meal_type, season, cuisines)
+    excluded = index.allergen(allergens) if allergens else None
+
+    dropped = set()
+    for step in [None] + RELAXATION_LADDER:
+        if step is not None:
+            if step not in masks:
+                continue
+            dropped.add(step)
+
+        bits, skipped = _combine(index, masks, excluded, dropped)
+        if bits.any():
+            relaxed = [name for name in CONSTRAINT_ORDER if name in dropped or name in skipped]
+            return FilterResult(index.rows(bits), tuple(relaxed))
+
+    present = [name for name in CONSTRAINT_ORDER if name in masks]
+
+    # Foods of the exact diet type without the allergens
+    if diet_type and allergens:
+        bits = index.diet_types.get(diet_type, index.no_rows) & ~excluded
+        if bits.any():
+            return FilterResult(index.rows(bits), tuple(name for name in present if name != 'diet_type'))
+
+    # Any foods without the allergens
+    bits = index.all_rows if excluded is None else index.all_rows & ~excluded
+    if bits.any():
+        return FilterResult(index.rows(bits)[:FALLBACK_SIZE], tuple(present))
+
+    # Nothing is free of the allergens, return random foods rather than nothing
+    rows = np.random.choice(index.n_rows, size=min(FALLBACK_SIZE, index.n_rows), replace=False)
+    return FilterResult(rows, tuple(present) + (('allergens',) if allergens else ()))
+
+
+def combine(index, diet_type=None, meal_type=None, season=None, cuisines=None):
+    """
+    Bitset of the foods matching every constraint that doesn't leave an empty set.
+
+    The first step of resolve() without allergens, which therefore never needs the
+    rest of the ladder. Returns the bitset and the names of the skipped constraints.
+    """
+    return _combine(index, _masks(index, diet_type, meal_type, season, cuisines), None, set())
+
+
+def _masks(index, diet_type, meal_type, season, cuisines):
+    masks = {}
+    if diet_type:
+        masks['diet_type'] = index.diet(diet_type)
+    if meal_type:
+        masks['meal_type'] = index.meal(meal_type)
+    if season:
+        masks['season'] = index.season(season)
+    if cuisines:
+        masks['cuisines'] = index.cuisine(cuisines)
+    return masks
+
+
+def _combine(index, masks, excluded, dropped):
+    """AND the constraint bitsets, skipping any that would leave no foods, then remove allergens"""
+    bits = index.all_rows
+    skipped = []
+
+    for name in CONSTRAINT_ORDER:
+        if name not in masks or name in dropped:
+            continue
+
+        mask = masks[name]
+        narrowed = bits & mask if mask is not None else None
+        if narrowed is not None and narrowed.any():
+            bits = narrowed
+        else:
+            skipped.append(name)
+
+    if excluded is not None:
+        bits = bits & ~excluded
+    return bits, skipped
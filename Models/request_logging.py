@@ -0,0 +1,98 @@
+import json
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+
+from flask import g, request
+
+# Logger that receives one record per request
+request_logger = logging.getLogger('calorix.requests')
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+def _extra_fields(record):
+    """Fields passed to a log call through extra="""
+    return {
+        key: value for key, value in vars(record).items()
+        if key not in _RECORD_ATTRIBUTES and not key.startswith('_')
+    }
+
+
+class TextFormatter(logging.Formatter):
+    """Format log records as readable lines, with any extra= fields appended as key=value"""
+
+    def formatMessage(self, record):
+        message = super().formatMessage(record)
+        extra = _extra_fields(record)
+        if extra:
+            message += ' ' + ' '.join(f"{key}={value}" for key, value in extra.items())
+        return message
+
+
+class JsonFormatter(logging.Formatter):
+    """Format log records as one JSON object per line, including any extra= fields"""
+
+    def format(self, record):
+        entry = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(json_format=False, level=None):
+    """
+    Configure the root logger.
+
+    The level comes from the LOG_LEVEL environment variable unless given, INFO by
+    default. json_format switches to one JSON object per line for log collectors.
+    """
+    level = level or os.environ.get('LOG_LEVEL', 'INFO').upper()
+
+    handler = logging.StreamHandler()
+    if json_format:
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(TextFormatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+
+def init_request_logging(app):
+    """Log method, path, status and duration of every request, tagged with a request id"""
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+    @app.after_request
+    def log_request(response):
+        duration_ms = (time.perf_counter() - g.get('request_start', time.perf_counter())) * 1000
+        request_id = g.get('request_id')
+
+        request_logger.info('request', extra={
+            'request_id': request_id,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+            'response_bytes': response.calculate_content_length(),
+            'remote_addr': request.remote_addr,
+        })
+
+        if request_id:
+            response.headers['X-Request-ID'] = request_id
+        return response
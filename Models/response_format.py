@@ -0,0 +1,59 @@
+import gzip
+import os
+import zlib
+
+# Content codings offered to clients, preferred first
+ENCODINGS = ['gzip', 'deflate']
+
+# zlib level trading CPU for size; responses are small, so compression stays cheap
+COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+
+_TRUE = {'1', 'true', 'yes', 'on'}
+
+
+class InvalidFieldsError(ValueError):
+    """Raised when a field projection names fields the response doesn't have"""
+
+    def __init__(self, invalid):
+        self.invalid = invalid
+        super().__init__(f"Unknown fields: {', '.join(invalid)}")
+
+
+def response_options(args, known_fields=None):
+    """
+    Field projection and compact flag requested in a query string.
+
+    ?fields=food_id,food_name,calories keeps only those fields of every food, and
+    ?compact=1 references foods by food_id into a shared food table. Returns the
+    fields as a sorted tuple, or None for all of them, and the flag. Fields outside
+    known_fields, when given, raise InvalidFieldsError.
+    """
+    fields = args.get('fields', '')
+    fields = tuple(sorted({field.strip() for field in fields.split(',') if field.strip()})) or None
+    if fields is not None and known_fields is not None:
+        invalid = [field for field in fields if field not in known_fields]
+        if invalid:
+            raise InvalidFieldsError(invalid)
+    compact = args.get('compact', '').strip().lower() in _TRUE
+    return fields, compact
+
+
+def negotiate_encoding(accept_encodings):
+    """Best content coding the client accepts, or None for an uncompressed body"""
+    return accept_encodings.best_match(ENCODINGS)
+
+
+def compress(body, encoding, level=COMPRESSION_LEVEL):
+    """Body compressed with a negotiated content coding"""
+    if encoding == 'gzip':
+        # A fixed mtime keeps the output reproducible
+        return gzip.compress(body, compresslevel=level, mtime=0)
+    if encoding == 'deflate':
+        # HTTP's deflate is the zlib format
+        return zlib.compress(body, level)
+    return body
+
+
+def representation(fields, compact):
+    """Short description of a projection and mode, for cache keys and ETags"""
+    return f"fields={','.join(fields) if fields else '*'};compact={int(compact)}"
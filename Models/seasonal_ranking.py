@@ -0,0 +1,128 @@
+import numpy as np
+
+from constraint_index import MEAL_TYPES, unpack_bits
+from filter_cache import FilterCache
+from relaxation import CONSTRAINT_ORDER, combine
+
+# Foods returned per seasonal recommendation
+RANKED_SIZE = 10
+
+# Tables kept for diet / meal type spellings outside the ones built up front
+MAX_TABLES = 256
+
+
+def protein_ratio(nutrients):
+    """Protein per calorie of every food, foods without calories count as having one"""
+    calories = nutrients['calories']
+    return nutrients['protein_g'] / np.where(calories == 0, 1, calories)
+
+
+class SeasonalRanking:
+    """
+    Best foods by protein to calorie ratio for one season, precomputed.
+
+    For every (diet type, meal type) combination the foods that pass the diet, meal
+    and season constraints are ranked once, and only the best few are kept, overall
+    and per cuisine. A request is then answered from its table: without cuisines the
+    top foods are already there, with cuisines the per-cuisine tops are merged by
+    rank. No request touches the rest of the database, whatever its size.
+
+    Results match resolve() followed by ranking: constraints that would leave no
+    foods are skipped and reported, and equal ratios are ranked in database order.
+    Tables for the database's own diet types and every meal type are built up front,
+    other spellings on first use.
+    """
+
+    def __init__(self, store, index, nutrients, season, size=RANKED_SIZE):
+        """
+        Parameters:
+        -----------
+        store : FoodStore
+            The food database, for the cuisine column
+        index : ConstraintIndex
+            Bitsets of the same store
+        nutrients : dict of str -> numpy.ndarray
+            Nutrient arrays of the store, with 'calories' and 'protein_g'
+        season : str
+            Season the rankings are for
+        size : int
+            Foods kept per table and cuisine
+        """
+        self.index = index
+        self.season = season
+        self.size = size
+        self.protein_ratio = protein_ratio(nutrients)
+
+        # Every food by descending ratio, and each food's position in that order
+        self._order = np.argsort(-self.protein_ratio, kind='stable')
+        self._rank = np.empty(len(self._order), dtype=np.int64)
+        self._rank[self._order] = np.arange(len(self._order))
+
+        if store.has_column('cuisine_type'):
+            self._cuisine_codes = store.columns['cuisine_type']
+            self._cuisine_names = store.categories['cuisine_type']
+        else:
+            self._cuisine_codes = None
+            self._cuisine_names = []
+
+        self._tables = FilterCache(MAX_TABLES)
+        for diet_type in [None] + list(index.diet_types):
+            for meal_type in [None] + MEAL_TYPES:
+                self._table(diet_type, meal_type)
+
+    def _table(self, diet_type, meal_type):
+        """Top rows overall and per cuisine for a diet and meal type, with the skipped constraints"""
+        key = (diet_type or None, meal_type or None)
+        table = self._tables.get(key)
+        if table is not None:
+            return table
+
+        bits, skipped = combine(self.index, diet_type, meal_type, self.season)
+        mask = unpack_bits(bits, self.index.n_rows)
+        ranked = self._order[mask[self._order]]
+
+        by_cuisine = {}
+        if self._cuisine_codes is not None and len(ranked):
+            # Group the ranked rows by cuisine, keeping rank order within each group
+            codes = self._cuisine_codes[ranked]
+            grouped = np.argsort(codes, kind='stable')
+            sorted_codes = codes[grouped]
+            starts = np.searchsorted(sorted_codes, np.arange(len(self._cuisine_names)), side='left')
+            stops = np.searchsorted(sorted_codes, np.arange(len(self._cuisine_names)), side='right')
+            for code, (start, stop) in enumerate(zip(starts, stops)):
+                if stop > start:
+                    by_cuisine[self._cuisine_names[code]] = ranked[grouped[start:min(stop, start + self.size)]]
+
+        table = (ranked[:self.size], by_cuisine, tuple(skipped))
+        return self._tables.put(key, table)
+
+    def recommend(self, diet_type=None, meal_type=None, cuisines=None):
+        """
+        Best rows for the constraints, best first, and the constraints that were relaxed.
+
+        Parameters:
+        -----------
+        diet_type, meal_type : str
+            Constraints, ignored when empty
+        cuisines : list of str
+            Any of these cuisines, ignored when empty or when none of them has foods
+            left by the other constraints
+
+        Returns:
+        --------
+        tuple
+            Row positions and relaxed constraint names in CONSTRAINT_ORDER
+        """
+        top, by_cuisine, skipped = self._table(diet_type, meal_type)
+        if not cuisines:
+            return top, skipped
+
+        matches = [by_cuisine[cuisine] for cuisine in set(cuisines) if cuisine in by_cuisine]
+        if not matches:
+            relaxed = [name for name in CONSTRAINT_ORDER if name in skipped or name == 'cuisines']
+            return top, tuple(relaxed)
+
+        # Each cuisine's best rows are in rank order, so the best overall are among them
+        candidates = np.concatenate(matches)
+        candidates = candidates[np.argsort(self._rank[candidates])][:self.size]
+        return candidates, skipped
@@ -0,0 +1,77 @@
+import numpy as np
+
+# Nutrient columns used by the ranking scores
+MACRO_COLUMNS = ['protein_g', 'fat_g', 'carbs_g']
+
+
+def top_k(scores, k):
+    """
+    Positions of the k lowest scores, best first.
+
+    Uses an O(n) partial selection and only sorts the k selected candidates, so the
+    full candidate set is never sorted or copied.
+    """
+    n = len(scores)
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+
+    candidates = np.argpartition(scores, k - 1)[:k] if k < n else np.arange(n)
+    return candidates[np.argsort(scores[candidates], kind='stable')]
+
+
+def top_k_rows(scores, k):
+    """Column positions of the k lowest scores in every row of a 2-D score matrix, best first"""
+    n = scores.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+
+    if k < n:
+        candidates = np.argpartition(scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+
+    candidate_scores = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(candidate_scores, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def calorie_distance(foods, targets):
+    """Absolute distance between each food's calories and the calorie target"""
+    return np.abs(foods['calories'] - targets['calories'])
+
+
+def macro_distance(foods, targets):
+    """Euclidean distance between each food's macros and the macro targets, relative to the targets"""
+    distance = 0
+    for column in MACRO_COLUMNS:
+        target = np.maximum(targets[column], 1)
+        distance = distance + ((foods[column] - targets[column]) / target) ** 2
+    return np.sqrt(distance)
+
+
+def combined_distance(foods, targets):
+    """Relative calorie distance plus macro distance, so both count on the same scale"""
+    calorie_target = np.maximum(targets['calories'], 1)
+    return calorie_distance(foods, targets) / calorie_target + macro_distance(foods, targets)
+
+
+# Ranking scores selectable by name, lower is better. Each takes a dict of candidate
+# nutrient arrays and a dict of targets; targets may be scalars or (profiles x 1)
+# arrays, in which case a (profiles x candidates) score matrix is returned.
+SCORERS = {
+    'calorie': calorie_distance,
+    'macro': macro_distance,
+    'combined': combined_distance,
+}
+
+
+def get_scorer(ranking):
+    """Resolve a ranking name or callable to a scoring function"""
+    if callable(ranking):
+        return ranking
+
+    if ranking not in SCORERS:
+        raise ValueError(f"Unknown ranking '{ranking}', expected one of {sorted(SCORERS)}")
+    return SCORERS[ranking]
@@ -0,0 +1,74 @@
+import gc
+import multiprocessing
+import os
+
+# Structured request logs by default when serving in production
+os.environ.setdefault('LOG_FORMAT', 'json')
+
+from gunicorn.app.base import BaseApplication
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def server_options():
+    """
+    Gunicorn settings, configurable through environment variables:
+
+    CALORIX_BIND           address to listen on, 0.0.0.0:5000 by default
+    CALORIX_WORKERS        worker processes, one per CPU by default
+    CALORIX_THREADS        threads per worker, 4 by default
+    CALORIX_TIMEOUT        seconds before a silent worker is restarted, 60 by default
+    CALORIX_MAX_REQUESTS   restart workers after this many requests, 0 (never) by default
+    """
+    return {
+        'bind': os.environ.get('CALORIX_BIND', '0.0.0.0:5000'),
+        'workers': _env_int('CALORIX_WORKERS', multiprocessing.cpu_count()),
+        'threads': _env_int('CALORIX_THREADS', 4),
+        'worker_class': 'gthread',
+        'timeout': _env_int('CALORIX_TIMEOUT', 60),
+        'max_requests': _env_int('CALORIX_MAX_REQUESTS', 0),
+        'max_requests_jitter': _env_int('CALORIX_MAX_REQUESTS', 0) // 10,
+        # Load the app in the master so forked workers share its memory
+        'preload_app': True,
+        'errorlog': '-',
+        'loglevel': os.environ.get('LOG_LEVEL', 'info').lower(),
+    }
+
+
+class CalorixServer(BaseApplication):
+    """
+    Pre-fork server for the diet planner API.
+
+    The recommender, its food store and every model are loaded once in the master
+    process. Workers are forked afterwards and share those read-only arrays and models
+    copy-on-write instead of each loading their own copy.
+    """
+
+    def __init__(self, options=None):
+        self.options = options or server_options()
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        import app as planner
+
+        # Models are loaded lazily by default, load them here so workers inherit them
+        if planner.recommender is not None:
+            planner.recommender.load_artifacts()
+
+        # Move everything allocated so far out of the garbage collector's reach, so
+        # collections in the workers don't touch (and copy) the shared pages
+        gc.collect()
+        gc.freeze()
+
+        return planner.app
+
+
+if __name__ == '__main__':
+    CalorixServer().run()
@@ -0,0 +1,229 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+from datetime import datetime
+
+import numpy as np
+
+from food_store import FoodStore
+from neighbor_index import NeighborIndex
+
+# File layout: MAGIC, format version (uint32), header length (uint32), JSON header,
+# then every array as raw little-endian bytes aligned to ALIGNMENT. The header records
+# each array's offset, dtype and shape so arrays can be mapped without copying. Text
+# columns are stored as fixed-width unicode arrays so they are mapped like the rest.
+MAGIC = b'CALXSNAP'
+SNAPSHOT_VERSION = 2
+ALIGNMENT = 64
+_PREAMBLE = struct.Struct('<8sII')
+
+# Files whose content the snapshot is derived from, relative to the models directory
+SOURCE_MODEL_FILES = ['food_scaler.pkl']
+
+
+class StaleSnapshotError(Exception):
+    """Raised when a snapshot was built from different source files or by another format version"""
+
+
+def _source_files(food_data_path, models_dir):
+    return [food_data_path] + [os.path.join(models_dir, name) for name in SOURCE_MODEL_FILES]
+
+
+def source_hash(food_data_path, models_dir):
+    """Content hash of the CSV and model files a snapshot is built from"""
+    digest = hashlib.sha256(f"snapshot-v{SNAPSHOT_VERSION}".encode())
+    for path in _source_files(food_data_path, models_dir):
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_stamp(food_data_path, models_dir):
+    """Size and modification time of the source files, checked before hashing them"""
+    stamp = []
+    for path in _source_files(food_data_path, models_dir):
+        stat = os.stat(path)
+        stamp.append([stat.st_size, stat.st_mtime_ns])
+    return stamp
+
+
+def write_snapshot(path, store, allergen_vocabulary, allergen_matrix, features, neighbor_index, content_hash,
+                   stamp=None):
+    """
+    Write a snapshot file atomically.
+
+    Parameters:
+    -----------
+    path : str
+        Destination file
+    store : FoodStore
+        Preprocessed food columns
+    allergen_vocabulary, allergen_matrix : list, numpy.ndarray
+        Parsed allergen vocabulary and (food x allergen) matrix
+    features : numpy.ndarray
+        Scaled nutritional feature matrix
+    neighbor_index : NeighborIndex
+        Top-K neighbor index over the features
+    content_hash : str
+        source_hash() of the files the snapshot was built from
+    stamp : list
+        source_stamp() of the same files, taken before hashing them
+    """
+    arrays = {}
+    for name in store.column_names:
+        values = store.columns[name]
+        if values.dtype == object:
+            # Fixed width, as wide as the longest value
+            values = np.array([str(value) for value in values], dtype=str)
+        arrays[f'column/{name}'] = values
+
+    arrays['allergen_matrix'] = allergen_matrix
+    arrays['features'] = np.asarray(features, dtype=np.float64)
+    arrays['neighbors/neighbors'] = neighbor_index.neighbors
+    arrays['neighbors/scores'] = neighbor_index.scores
+    arrays['neighbors/vectors'] = neighbor_index.vectors
+
+    # Lay out array offsets relative to the start of the data section
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        offset += (-offset) % ALIGNMENT
+        layout[name] = {'offset': offset, 'dtype': array.dtype.newbyteorder('<').str, 'shape': list(array.shape)}
+        offset += array.nbytes
+
+    header = json.dumps({
+        'source_hash': content_hash,
+        'source_stamp': stamp,
+        'created_at': datetime.now().isoformat(),
+        'column_names': store.column_names,
+        'categories': {name: [str(value) for value in values] for name, values in store.categories.items()},
+        'allergen_vocabulary': list(allergen_vocabulary),
+        'arrays': layout,
+    }).encode('utf-8')
+
+    data_start = _PREAMBLE.size + len(header)
+    data_start += (-data_start) % ALIGNMENT
+
+    # Write to a temporary file and rename, so readers never see a partial snapshot
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.snapshot-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_PREAMBLE.pack(MAGIC, SNAPSHOT_VERSION, len(header)))
+            f.write(header)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]['offset'])
+                f.write(array.astype(layout[name]['dtype'], copy=False).tobytes())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class Snapshot:
+    """
+    Read-only, memory-mapped view of a snapshot file.
+
+    Arrays, text columns included, are zero-copy views into the mapping, so opening a
+    snapshot only parses the JSON header and pages in the data that is actually touched.
+    """
+
+    def __init__(self, path, expected_hash=None, sources=None):
+        """
+        Open a snapshot file.
+
+        Parameters:
+        -----------
+        path : str
+            Snapshot file written by write_snapshot
+        expected_hash : str
+            If given, source_hash() of the current source files; a snapshot built from
+            different files raises StaleSnapshotError
+        sources : tuple
+            (food_data_path, models_dir) to check the snapshot against instead of
+            expected_hash; the files are only hashed if their sizes or modification
+            times changed since the snapshot was written
+        """
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, header_length = _PREAMBLE.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a food snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise StaleSnapshotError(f"Snapshot format version {version}, expected {SNAPSHOT_VERSION}")
+
+        self.header = json.loads(self._mmap[_PREAMBLE.size:_PREAMBLE.size + header_length])
+        if sources is not None and self.header.get('source_stamp') != source_stamp(*sources):
+            expected_hash = source_hash(*sources)
+        if expected_hash is not None and self.header['source_hash'] != expected_hash:
+            raise StaleSnapshotError(f"Snapshot {path} was built from different source files")
+
+        data_start = _PREAMBLE.size + header_length
+        self._data_start = data_start + (-data_start) % ALIGNMENT
+
+        self.store = self._build_store()
+        self.allergen_vocabulary = self.header['allergen_vocabulary']
+        self.allergen_matrix = self.array('allergen_matrix')
+        self.features = self.array('features')
+        self.neighbor_index = NeighborIndex(
+            self.array('neighbors/neighbors'),
+            self.array('neighbors/scores'),
+            self.array('neighbors/vectors')
+        )
+
+    def array(self, name):
+        """Zero-copy view of one stored array"""
+        spec = self.header['arrays'][name]
+        dtype = np.dtype(spec['dtype'])
+        count = int(np.prod(spec['shape'], dtype=np.int64))
+        array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=self._data_start + spec['offset'])
+        return array.reshape(spec['shape'])
+
+    def _build_store(self):
+        columns = {name: self.array(f'column/{name}') for name in self.header['column_names']}
+
+        categories = {
+            name: np.array(values, dtype=object)
+            for name, values in self.header['categories'].items()
+        }
+        return FoodStore(columns, categories, self.header['column_names'])
+
+
+def build(food_data_path, models_dir, output_path):
+    """Regenerate a snapshot from the food database CSV and the model files"""
+    from diet_recommendation_app import DietRecommendationApp
+
+    recommender = DietRecommendationApp(food_data_path, models_dir, use_snapshot=False)
+    stamp = source_stamp(food_data_path, models_dir)
+    write_snapshot(
+        output_path,
+        recommender.store,
+        recommender.allergen_vocabulary,
+        recommender.allergen_matrix,
+        recommender.features,
+        recommender.neighbor_index,
+        source_hash(food_data_path, models_dir),
+        stamp
+    )
+    return output_path
+
+
+if __name__ == '__main__':
+    here = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description="Build the food database snapshot used for fast startup")
+    parser.add_argument('--food-data', default=os.path.join(here, 'seasonal_food_database.csv'))
+    parser.add_argument('--models-dir', default=here)
+    parser.add_argument('--output', default=os.path.join(here, 'food_snapshot.bin'))
+    args = parser.parse_args()
+
+    print(f"Snapshot written to {build(args.food_data, args.models_dir, args.output)}")